@@ -22,8 +22,10 @@ import os
 import readline
 
 import animanager
+from animanager import anidb
 from animanager.animecmd import AnimeCmd
 from animanager import config
+from animanager.localanidb import LocalAniDB
 from animanager import migrations
 
 _DEFAULT_CONFIG = os.path.join(os.environ['HOME'], '.animanager', 'config.ini')
@@ -42,6 +44,10 @@ def main():
     cfg = config.load(args.config)
     db_path = cfg['anime'].getpath('database')
     migrations.migrate(str(db_path))
+    if args.local_anidb:
+        server = LocalAniDB(args.local_anidb, args.local_anidb_latency)
+        server.start()
+        anidb.set_client(server.client)
     cmd = AnimeCmd(cfg)
     print(_INTRO)
     cmd.cmdloop()
@@ -55,6 +61,15 @@ def _parse_args():
     parser.add_argument('--debug',
                         action='store_true',
                         help='Enable debug output.')
+    parser.add_argument('--local-anidb',
+                        metavar='DIR',
+                        help='Use a local AniDB stand-in serving recorded'
+                        ' responses from DIR, for testing and benchmarking.')
+    parser.add_argument('--local-anidb-latency',
+                        type=float,
+                        default=0,
+                        metavar='SECONDS',
+                        help='Delay responses from the local AniDB stand-in.')
     return parser.parse_args()
 
 
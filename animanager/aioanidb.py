@@ -0,0 +1,150 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+"""asyncio AniDB API client.
+
+HTTP requests are made with a shared requests session in a thread pool,
+so connections to AniDB are reused and the event loop is never blocked
+on the network.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from animanager import anidb
+
+
+class AsyncAniDB:
+
+    """asyncio AniDB API client.
+
+    At most workers requests are made at once, and requests are started
+    no faster than limiter allows.  Each request is given up after
+    timeout seconds.
+
+    The client must be closed after use, for example by using it as an
+    async context manager.
+    """
+
+    def __init__(self, limiter: 'Optional[TokenBucket]' = None,
+                 workers: int = 1, timeout: float = anidb._TIMEOUT):
+        self._limiter = limiter
+        self._timeout = timeout
+        self._session = requests.Session()
+        self._executor = ThreadPoolExecutor(workers)
+        # Tokens are only taken by requests that are about to run, so
+        # queued requests that get cancelled don't use up the limiter.
+        self._semaphore = asyncio.Semaphore(workers)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self._session.close()
+
+    async def request_anime_xml(self, aid: int) -> str:
+        """Make an anime API request, returning the unparsed XML.
+
+        Raises asyncio.TimeoutError if the request times out.
+        """
+        async with self._semaphore:
+            if self._limiter is not None:
+                await self._limiter.acquire_async()
+            loop = asyncio.get_event_loop()
+            try:
+                return await asyncio.wait_for(
+                    loop.run_in_executor(self._executor, self._get_anime, aid),
+                    self._timeout)
+            except requests.Timeout as e:
+                raise asyncio.TimeoutError from e
+
+    def _get_anime(self, aid: int) -> str:
+        response = self._session.get(
+            anidb._CLIENT.url, params=anidb.anime_params(aid),
+            timeout=self._timeout)
+        response.raise_for_status()
+        return response.text
+
+    async def request_anime(self, aid: int) -> anidb.Anime:
+        """Make an anime API request."""
+        return anidb.parse_anime(await self.request_anime_xml(aid))
+
+    async def request_anime_many(
+            self,
+            aids: 'Iterable[int]',
+            cache: 'Optional[AnimeCache]' = None,
+            refresh: bool = False,
+            parse: 'Callable[[str], Any]' = anidb.parse_anime,
+    ) -> 'AsyncIterator[anidb.Anime]':
+        """Make anime API requests concurrently.
+
+        Like :func:`animanager.anidb.request_anime_many`, anime with
+        fresh cached responses are yielded first, then the rest in order
+        as they are requested.  If a request fails,
+        :exc:`animanager.anidb.RequestError` is raised when its anime is
+        reached and the other requests are cancelled.
+
+        Responses are parsed with parse, which can be
+        :func:`animanager.anidb.parse_anime_stream` to yield anime and
+        episode iterator pairs instead.  Responses are only cached once
+        they have been parsed, and parse errors are raised as
+        :exc:`animanager.anidb.RequestError`.
+        """
+        missing = []
+        for aid in aids:
+            anime = None
+            if cache is not None and not refresh:
+                anime = anidb.parse_cached(cache, aid, parse)
+            if anime is None:
+                missing.append(aid)
+            else:
+                yield anime
+        tasks = [(aid, asyncio.ensure_future(self.request_anime_xml(aid)))
+                 for aid in missing]
+        try:
+            for aid, task in tasks:
+                try:
+                    text = await task
+                    anime = parse(text)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    raise anidb.RequestError(aid) from e
+                if cache is not None:
+                    cache.put(aid, text)
+                yield anime
+        finally:
+            for _, task in tasks:
+                task.cancel()
+            await asyncio.gather(
+                *(task for _, task in tasks), return_exceptions=True)
+
+
+def run(coro):
+    """Run a coroutine in a new event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
@@ -17,25 +17,406 @@
 
 """AniDB API bindings."""
 
+from concurrent.futures import Future
+import gzip
+import hashlib
+import io
+import json
+import logging
 import os
 import re
+import tempfile
+import threading
+import time
 from typing import NamedTuple
+import xml.etree.ElementTree as ET
 
 from mir.anidb import api
 import mir.anidb.anime as alib
 import mir.anidb.titles as tlib
 import mir.cp
+import requests
 
-_CLIENT = api.Client(
+from animanager.fetch import fetch_all
+from animanager.lru import LRUCache
+from animanager.titles import (
+    FTSTitleStore, MemoryTitleStore, MmapTitleStore, NormalizedTitleIndex,
+    diff_titles, normalize,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Client(NamedTuple):
+    """AniDB HTTP API client."""
+    name: str
+    version: int
+    url: str = 'http://api.anidb.net:9001/httpapi'
+    titles_url: str = 'http://anidb.net/api/anime-titles.xml.gz'
+
+
+_CLIENT = Client(
     name='kfanimanager',
     version=1,
 )
 
 
-def request_anime(aid: int) -> 'Anime':
-    """Make an anime API request."""
-    anime_info = alib.request_anime(_CLIENT, aid)
-    return Anime._make(anime_info)
+def set_client(client: Client) -> Client:
+    """Set the client used for AniDB requests, returning the old one.
+
+    This is used to make requests to a local stand-in server instead;
+    see :mod:`animanager.localanidb`.
+    """
+    global _CLIENT
+    old, _CLIENT = _CLIENT, client
+    return old
+
+
+# Seconds to wait for AniDB to respond.
+_TIMEOUT = 30
+
+
+def request_anime(
+        aid: int,
+        cache: 'Optional[AnimeCache]' = None,
+        refresh: bool = False,
+        limiter: 'Optional[TokenBucket]' = None,
+) -> 'Anime':
+    """Make an anime API request, respecting limiter if given.
+
+    If cache is given, a fresh cached response is used instead, unless
+    refresh is true.  New responses are added to the cache.
+    """
+    return next(request_anime_many(
+        [aid], limiter, cache=cache, refresh=refresh))
+
+
+def request_anime_many(
+        aids: 'Iterable[int]',
+        limiter: 'Optional[TokenBucket]',
+        workers: int = 1,
+        cache: 'Optional[AnimeCache]' = None,
+        refresh: bool = False,
+) -> 'Iterator[Anime]':
+    """Make anime API requests, respecting limiter.
+
+    Anime with fresh cached responses are yielded first, without
+    waiting for the limiter.  The other anime are yielded as they are
+    requested; see :func:`animanager.fetch.fetch_all`.  cache and
+    refresh are as for :func:`request_anime`.
+    """
+    missing = []
+    for aid in aids:
+        anime = None
+        if cache is not None and not refresh:
+            anime = parse_cached(cache, aid, parse_anime)
+        if anime is None:
+            missing.append(aid)
+        else:
+            yield anime
+    for aid, text in fetch_all(request_anime_xml, missing, limiter, workers):
+        anime = parse_anime(text)
+        # Only responses that parse are cached, so errors are not.
+        if cache is not None:
+            cache.put(aid, text)
+        yield anime
+
+
+def parse_cached(cache: 'AnimeCache', aid: int,
+                 parse: 'Callable[[str], Any]') -> 'Optional[Any]':
+    """Parse a cached response, or return None if there is no good one."""
+    text = cache.get(aid)
+    if text is None:
+        return None
+    try:
+        return parse(text)
+    except Exception:
+        logger.warning('Ignoring bad cached response for anime %d', aid,
+                       exc_info=True)
+        return None
+
+
+def request_anime_xml(aid: int) -> str:
+    """Make an anime API request, returning the unparsed XML."""
+    response = requests.get(
+        _CLIENT.url, params=anime_params(aid), timeout=_TIMEOUT)
+    response.raise_for_status()
+    return response.text
+
+
+def anime_params(aid: int) -> 'Dict[str, Any]':
+    """Return the query parameters for an anime API request."""
+    return {
+        'client': _CLIENT.name,
+        'clientver': _CLIENT.version,
+        'protover': 1,
+        'request': 'anime',
+        'aid': aid,
+    }
+
+
+def parse_anime(text: str) -> 'Anime':
+    """Parse an anime API response."""
+    etree = api.unpack_xml(text)
+    return Anime._make(alib._unpack_anime(etree.getroot()))
+
+
+def parse_anime_stream(text: str) -> 'Tuple[Anime, EpisodeStream]':
+    """Parse an anime API response incrementally.
+
+    Return the anime without its episodes, and an :class:`EpisodeStream`
+    that parses the episodes as it is iterated.  Parsed episode elements
+    are discarded, so the parsed document does not grow with the number
+    of episodes.
+
+    The whole response is parsed once before returning, so errors in
+    the episodes are raised here instead of while iterating them.  The
+    :func:`episodes_digest` of the episodes is computed in the same
+    pass and kept as the digest attribute of the stream.
+
+    Like in AniDB responses, the episodes must come after the other
+    anime fields.
+    """
+    events, root, episodes = _parse_until_episodes(text)
+    header = ET.Element(root.tag, root.attrib)
+    header.extend(child for child in root if child is not episodes)
+    header.append(ET.Element('episodes'))
+    anime = Anime._make(alib._unpack_anime(header))
+    digest = episodes_digest(_iter_episodes(events, episodes))
+    for _ in events:
+        pass
+    return anime, EpisodeStream(text, digest)
+
+
+class EpisodeStream:
+
+    """Episodes of an anime API response, parsed as they are iterated.
+
+    Each iteration parses the response again, so the episodes can be
+    iterated more than once without keeping them in memory.  digest is
+    the :func:`episodes_digest` of the episodes.
+    """
+
+    def __init__(self, text: str, digest: bytes):
+        self._text = text
+        self.digest = digest
+
+    def __iter__(self) -> 'Iterator[Episode]':
+        events, _, episodes = _parse_until_episodes(self._text)
+        return _iter_episodes(events, episodes)
+
+
+def _parse_until_episodes(text: str):
+    """Parse an anime API response up to the start of the episodes.
+
+    Return the iterparse events, the root element, and the episodes
+    element, or None if there are no episodes.
+    """
+    events = ET.iterparse(
+        io.BytesIO(text.encode('utf-8')), events=('start', 'end'))
+    _, root = next(events)
+    if root.tag == 'error':
+        for _ in events:
+            pass
+        raise api.APIError(root.text)
+    depth = 1
+    for event, element in events:
+        if event == 'end':
+            depth -= 1
+            continue
+        depth += 1
+        if depth == 2 and element.tag == 'episodes':
+            return events, root, element
+    return events, root, None
+
+
+def _iter_episodes(events, episodes: 'Optional[ET.Element]'):
+    """Parse episodes from iterparse events inside episodes."""
+    if episodes is None:
+        return
+    for event, element in events:
+        if event != 'end':
+            continue
+        if element is episodes:
+            return
+        # Finished children of episodes are removed, so the current one
+        # is always first.
+        if element is episodes[0]:
+            if element.tag == 'episode':
+                yield Episode._make(alib._unpack_episode(element))
+            episodes.remove(element)
+
+
+class RequestError(Exception):
+
+    """Requesting an anime failed.
+
+    The exception that caused the failure is set as __cause__.
+    """
+
+    def __init__(self, aid: int):
+        super().__init__(aid)
+        self.aid = aid
+
+    def __str__(self):
+        return f'Requesting anime {self.aid} failed: {self.__cause__}'
+
+
+def fetched_time(cache: 'Optional[AnimeCache]', aid: int) -> float:
+    """Return when an anime was requested.
+
+    This is when its response was cached, or now if it was not.
+    """
+    fetched = None if cache is None else cache.fetched(aid)
+    return time.time() if fetched is None else fetched
+
+
+class AnimeCache:
+
+    """On-disk cache of anime API responses.
+
+    Responses are stored gzipped in directory, one file per aid.
+    Responses older than ttl are not used.  When the cache grows larger
+    than max_size bytes, the oldest responses are removed.
+    """
+
+    def __init__(self, directory: 'PathLike', ttl: 'timedelta',
+                 max_size: int):
+        self._directory = os.fspath(directory)
+        self._ttl = ttl.total_seconds()
+        self._max_size = max_size
+        self._size = None
+        self._lock = threading.Lock()
+        os.makedirs(self._directory, exist_ok=True)
+
+    def _path(self, aid: int) -> str:
+        return os.path.join(self._directory, f'{aid}.xml.gz')
+
+    def get(self, aid: int) -> 'Optional[str]':
+        """Get a cached response, or None if there is no fresh one."""
+        path = self._path(aid)
+        try:
+            if time.time() - os.path.getmtime(path) > self._ttl:
+                return None
+            with gzip.open(path, 'rt', encoding='utf-8') as file:
+                return file.read()
+        except (OSError, EOFError):
+            return None
+
+    def fetched(self, aid: int) -> 'Optional[float]':
+        """Return when a cached response was requested, or None."""
+        try:
+            return os.path.getmtime(self._path(aid))
+        except OSError:
+            return None
+
+    def put(self, aid: int, text: str) -> None:
+        """Cache a response."""
+        data = gzip.compress(text.encode('utf-8'))
+        path = self._path(aid)
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            try:
+                self._size -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            fd, tmp = tempfile.mkstemp(dir=self._directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(tmp, path)
+            self._size += len(data)
+            if self._size > self._max_size:
+                self._evict()
+
+    def _entries(self) -> 'Iterable[Tuple[float, int, str]]':
+        """Yield (mtime, size, path) for cached responses."""
+        with os.scandir(self._directory) as entries:
+            for entry in entries:
+                if entry.name.endswith('.xml.gz'):
+                    stat = entry.stat()
+                    yield stat.st_mtime, stat.st_size, entry.path
+
+    def _evict(self) -> None:
+        """Remove the oldest responses until the cache fits."""
+        entries = sorted(self._entries())
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= self._max_size:
+                break
+            os.unlink(path)
+            self._size -= size
+
+
+class Prefetcher:
+
+    """Requests anime into an :class:`AnimeCache` in the background.
+
+    Requests are made one at a time on a worker thread, respecting
+    limiter.  Errors are logged and otherwise ignored, since nobody is
+    waiting on the results.
+    """
+
+    def __init__(self, cache: AnimeCache, limiter: 'Optional[TokenBucket]'):
+        self._cache = cache
+        self._limiter = limiter
+        self._pending = []
+        # aid being requested, if any.
+        self._current = None
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def prefetch(self, aids: 'Iterable[int]') -> None:
+        """Prefetch anime.
+
+        aids replace any anime that have not been requested yet, so a
+        new search supersedes the last one.
+        """
+        with self._condition:
+            self._pending = list(aids)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='Prefetcher', daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def wait(self, timeout: 'Optional[float]' = None) -> bool:
+        """Wait until all anime are prefetched.
+
+        Return False if timeout seconds passed first.
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._pending and self._current is None, timeout)
+
+    def wait_for(self, aids: 'Iterable[int]',
+                 timeout: 'Optional[float]' = None) -> bool:
+        """Wait until none of aids are being prefetched.
+
+        aids that have not been requested yet are no longer prefetched,
+        so the caller can request them itself.  Return False if timeout
+        seconds passed first.
+        """
+        aids = set(aids)
+        with self._condition:
+            self._pending = [aid for aid in self._pending if aid not in aids]
+            return self._condition.wait_for(
+                lambda: self._current not in aids, timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._current = None
+                self._condition.notify_all()
+                self._condition.wait_for(lambda: self._pending)
+                aid = self._current = self._pending.pop(0)
+            try:
+                for _ in request_anime_many(
+                        [aid], self._limiter, cache=self._cache):
+                    pass
+            except Exception:
+                logger.warning('Prefetching anime %d failed', aid,
+                               exc_info=True)
 
 
 class Anime(alib.Anime):
@@ -46,8 +427,7 @@ class Anime(alib.Anime):
 
     @property
     def episodes(self) -> 'Tuple[Episode]':
-        return tuple(Episode._make(ep)
-                     for ep in alib.Anime.episodes.fget(self))
+        return tuple(Episode._make(ep) for ep in super().episodes)
 
 
 class Episode(alib.Episode):
@@ -74,41 +454,300 @@ class Episode(alib.Episode):
         return self.titles[0].title
 
 
+def episodes_digest(episodes: 'Iterable[Episode]') -> bytes:
+    """Hash the episode fields that are stored in the database.
+
+    Changes to other fields, like ratings, do not change the hash.
+    """
+    digest = hashlib.sha1()
+    for episode in episodes:
+        digest.update(json.dumps([
+            episode.type, episode.number, episode.title, episode.length,
+        ]).encode())
+    return digest.digest()
+
+
 class TitleSearcher:
 
-    """Provides anime title searching, utilizing a local cache."""
+    """Provides anime title searching, utilizing a local cache.
+
+    store selects how titles are stored for searching.  'pickle' loads
+    the cached titles into memory.  'fts5' keeps the titles in an SQLite
+    FTS5 table next to the cache, so they don't need to be loaded.
+    'mmap' keeps the titles in a compact file next to the cache, which
+    is memory mapped and only decoded as needed.
+
+    workers is the number of processes used by the 'mmap' store for
+    queries that have to scan every title.
+
+    The results of the last search_cache_size queries are cached in
+    search_cache until the titles are refreshed.
+    """
+
+    def __init__(self, cachedir, store: str = 'pickle', workers: int = 1,
+                 search_cache_size: int = 32):
+        self._cache_path = os.path.join(cachedir, 'anime-titles.pickle')
+        self._cache = tlib.PickleCache(self._cache_path)
+        self._store = _make_title_store(cachedir, store, workers)
+        self._preloading = None
+        self.search_cache = LRUCache(search_cache_size)
+
+    def preload(self) -> None:
+        """Start loading titles in a background thread.
+
+        The next search waits for the titles to finish loading.
+        """
+        if self._preloading is None:
+            self._preloading = _run_in_background(lambda: self._titles)
 
-    def __init__(self, cachedir):
-        self._cache = tlib.PickleCache(os.path.join(cachedir, 'anime-titles.pickle'))
+    def _wait_for_preload(self) -> None:
+        future, self._preloading = self._preloading, None
+        if future is None:
+            return
+        try:
+            future.result()
+        except Exception:
+            logger.warning('Preloading titles failed', exc_info=True)
 
     @mir.cp.NonDataCachedProperty
     def _titles_list(self):
         try:
             return self._cache.load()
         except tlib.CacheMissingError:
-            titles = tlib.request_titles()
+            titles = request_titles()
             self._cache.save(titles)
             return titles
 
-    def search(self, query: 're.Pattern') -> 'Iterable[_WorkTitles]':
-        """Search titles using a compiled RE query."""
+    @mir.cp.NonDataCachedProperty
+    def _titles(self) -> 'TitleStore':
+        if self._store.is_empty() or self._store_is_stale():
+            self._store.replace(self._titles_list)
+        return self._store
+
+    def _store_is_stale(self) -> bool:
+        """Return whether the store is older than the cached titles.
+
+        This happens if an update of the store failed, or if the store
+        was not in use when the titles were refreshed.
+        """
+        modified = self._store.modified()
+        if modified is None:
+            return False
+        try:
+            return modified < os.path.getmtime(self._cache_path)
+        except FileNotFoundError:
+            return False
+
+    @mir.cp.NonDataCachedProperty
+    def _normalized_titles(self) -> NormalizedTitleIndex:
+        return NormalizedTitleIndex(self._titles_list)
+
+    def refresh(
+            self,
+            ttl: 'Optional[timedelta]' = None,
+            path: 'Optional[PathLike]' = None,
+    ) -> 'Optional[TitlesDiff]':
+        """Refresh cached titles, applying only the changes.
+
+        If ttl is given and the cached titles are younger than ttl, do
+        nothing and return None.  If path is given, read titles from
+        that AniDB titles dump instead of requesting them.
+        """
+        self._wait_for_preload()
+        if ttl is not None and self._cache_age() < ttl.total_seconds():
+            return None
+        if path is None:
+            new_titles = request_titles()
+        else:
+            new_titles = read_titles(path)
+        try:
+            old_titles = self.__dict__.get('_titles_list') or self._cache.load()
+        except tlib.CacheMissingError:
+            old_titles = None
+        # The diff is only valid for the store if the store holds the
+        # old titles.
+        replace = (old_titles is None or self._store.is_empty()
+                   or self._store_is_stale())
+        diff = diff_titles(old_titles or [], new_titles)
+        self.search_cache.clear()
+        self._cache.save(new_titles)
+        self._titles_list = new_titles
+        self.__dict__.pop('_normalized_titles', None)
+        if replace:
+            self._store.replace(new_titles)
+        else:
+            self._store.update(diff, new_titles)
+        self.__dict__['_titles'] = self._store
+        return diff
+
+    def _cache_age(self) -> float:
+        """Return age of the cached titles in seconds."""
+        try:
+            return time.time() - os.path.getmtime(self._cache_path)
+        except FileNotFoundError:
+            return float('inf')
+
+    def search(self, query: 're.Pattern') -> 'Iterable[WorkTitles]':
+        """Search titles using a compiled RE query.
+
+        Each matching anime is yielded once.  Results are cached as
+        they are found, so searching again or reading later pages of
+        results continues from where the last search stopped.
+        """
+        return self._cached_search(
+            (query.pattern, query.flags), self._search, query)
+
+    def search_normalized(self, text: str) -> 'Iterable[WorkTitles]':
+        """Search titles ignoring case, width, accents and punctuation.
+
+        The words of text must appear in order in one of the titles.
+        Results are cached like :meth:`search`.
+        """
+        return self._cached_search(
+            ('normalized', normalize(text)), self._search_normalized, text)
+
+    def _cached_search(self, key, search, *args) -> 'Iterable[WorkTitles]':
+        """Return cached results for key, or call search with args."""
+        results = self.search_cache.get(key)
+        if results is None:
+            # A failed search must not stay cached as partial results.
+            results = _SearchResults(
+                search(*args), lambda: self.search_cache.pop(key))
+            self.search_cache[key] = results
+        return iter(results)
+
+    def _search(self, query: 're.Pattern') -> 'Iterable[WorkTitles]':
+        self._wait_for_preload()
         titles: 'Titles'
-        for titles in self._titles_list:
+        for titles in self._titles.candidates(query):
             title: 'AnimeTitle'
-            for title in titles.titles:
-                if query.search(title.title):
-                    yield WorkTitles(
-                        aid=titles.aid,
-                        main_title=_get_main_title(titles.titles),
-                        titles=[t.title for t in titles.titles],
-                    )
-                    continue
+            if any(query.search(title.title) for title in titles.titles):
+                yield WorkTitles(aid=titles.aid, anime_titles=titles.titles)
+
+    def _search_normalized(self, text: str) -> 'Iterable[WorkTitles]':
+        # The normalized index is built from the titles in memory, even
+        # for stores that keep them on disk.
+        self._wait_for_preload()
+        for titles in self._normalized_titles.search(text):
+            yield WorkTitles(aid=titles.aid, anime_titles=titles.titles)
+
+
+class _SearchResults:
+
+    """Results of a search, found as they are needed.
+
+    Results found so far are kept, so iterating again yields them
+    without searching, and then continues the search where the
+    furthest iteration stopped.  If the search raises, on_error is
+    called before the exception propagates, since the search cannot
+    be continued.
+    """
+
+    def __init__(self, results: 'Iterable[WorkTitles]',
+                 on_error: 'Callable[[], Any]'):
+        self._found = []
+        self._rest = iter(results)
+        self._on_error = on_error
+
+    def __iter__(self):
+        i = 0
+        while True:
+            if i < len(self._found):
+                yield self._found[i]
+                i += 1
+                continue
+            if self._rest is None:
+                return
+            try:
+                self._found.append(next(self._rest))
+            except StopIteration:
+                self._rest = None
+            except BaseException:
+                self._on_error()
+                raise
+
+
+def request_titles() -> 'List[Titles]':
+    """Request the AniDB titles dump."""
+    data = request_titles_dump()
+    # The dump is a gzip file, which is not decompressed automatically
+    # unless it is also sent with gzip Content-Encoding.
+    if data.startswith(b'\x1f\x8b'):
+        data = gzip.decompress(data)
+    return _parse_titles(ET.fromstring(data))
+
+
+def request_titles_dump() -> bytes:
+    """Request the AniDB titles dump, returning the raw file."""
+    response = requests.get(_CLIENT.titles_url, timeout=_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+
+def read_titles(path: 'PathLike') -> 'List[Titles]':
+    """Read titles from an AniDB titles dump file.
+
+    The file may be gzipped, like the one served by AniDB.
+    """
+    path = os.fspath(path)
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as file:
+        return _parse_titles(ET.parse(file).getroot())
+
+
+def _parse_titles(root: ET.Element) -> 'List[Titles]':
+    if root.tag == 'error':
+        raise api.APIError(root.text)
+    return [
+        tlib.Titles(
+            aid=int(anime.get('aid')),
+            titles=tuple(alib.unpack_anime_title(title) for title in anime),
+        )
+        for anime in root
+    ]
+
+
+def _make_title_store(cachedir, store: str, workers: int) -> 'TitleStore':
+    if store == 'pickle':
+        return MemoryTitleStore()
+    elif store == 'fts5':
+        return FTSTitleStore(os.path.join(cachedir, 'anime-titles.sqlite'))
+    elif store == 'mmap':
+        return MmapTitleStore(
+            os.path.join(cachedir, 'anime-titles.bin'), workers)
+    else:
+        raise ValueError(f'Invalid title store {store!r}')
+
+
+def _run_in_background(func) -> Future:
+    """Call func in a daemon thread, returning a Future for the result."""
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
 
 
 class WorkTitles(NamedTuple):
     aid: int
-    main_title: str
-    titles: 'List[str]'
+    anime_titles: 'Tuple[AnimeTitle]'
+
+    @property
+    def main_title(self) -> str:
+        return _get_main_title(self.anime_titles)
+
+    @property
+    def titles(self) -> 'List[str]':
+        return [title.title for title in self.anime_titles]
 
 
 def _get_main_title(titles: 'Iterable[AnimeTitle]'):
@@ -23,11 +23,12 @@ import apsw
 from dataclasses import dataclass
 import mir.cp
 
-from animanager.anidb import TitleSearcher
+from animanager.anidb import AnimeCache, Prefetcher, TitleSearcher
 from animanager.cmd.results import AIDParseError, AIDResults, AIDResultsManager
 from animanager.cmdlib import CmdExit
 from animanager import commands
 from animanager.db import cachetable, query
+from animanager.fetch import TokenBucket
 from animanager.files import FilePicker, Rule
 
 logger = logging.getLogger(__name__)
@@ -47,10 +48,12 @@ class AnimeCmd:
         'fix': commands.fix,
         'gpl': commands.gpl,
         'help': commands.help,
+        'jobs': commands.jobs,
         'purgecache': commands.purgecache,
         'q': commands.quit,
         'quit': commands.quit,
         'r': commands.reset,
+        'refreshtitles': commands.refreshtitles,
         'reg': commands.register,
         'register': commands.register,
         'reset': commands.reset,
@@ -75,7 +78,22 @@ class AnimeCmd:
         s.db = _connect(config['anime'].getpath('database'))
         s.cache_manager = cachetable.make_manager(s.db)
         s.cache_manager.setup()
-        s.titles = TitleSearcher(config['anime'].getpath('anidb_cache'))
+        s.titles = TitleSearcher(
+            config['anime'].getpath('anidb_cache'),
+            config['anime'].get('title_store'),
+            config['anime'].getint('search_workers') or os.cpu_count(),
+            config['anime'].getint('search_cache_size'),
+        )
+        if config['anime'].getboolean('preload_titles'):
+            s.titles.preload()
+        s.anime_cache = AnimeCache(
+            config['anime'].getpath('anidb_cache') / 'anime',
+            config['anime'].getduration('anime_cache_ttl'),
+            config['anime'].getint('anime_cache_size') * 2**20,
+        )
+        s.limiter = TokenBucket(
+            1 / config['anime'].getduration('request_interval').total_seconds())
+        s.prefetcher = Prefetcher(s.anime_cache, s.limiter)
         s.results = AIDResultsManager({
             'db': AIDResults([
                 'Title', 'Type', 'Episodes', 'Complete', 'Available',
@@ -111,9 +129,12 @@ class AnimeCmd:
 
 @dataclass
 class State:
+    anime_cache: 'AnimeCache' = None
     cache_manager: 'CacheTableManager' = None
     config: 'ConfigParser' = None
     db: 'Connection' = None
+    limiter: 'TokenBucket' = None
+    prefetcher: 'Prefetcher' = None
     results: 'AIDResultsManager' = None
     titles: 'TitleSearcher' = None
 
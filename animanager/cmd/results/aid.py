@@ -78,6 +78,8 @@ class AIDResultsManager:
         return key in self.results
 
     _key_pattern = re.compile(r'^(\w+):(\d+)$')
+    _key_list_pattern = re.compile(r'^(\w+):(.+)$')
+    _range_pattern = re.compile(r'^(\d+)-(\d+)$')
 
     @_set_last_aid
     def parse_aid(self, text, default_key):
@@ -119,7 +121,67 @@ class AIDResultsManager:
             number = int(number)
         except ValueError:
             raise InvalidSyntaxError(number)
+        return self._get_aid(key, number)
 
+    def parse_aids(self, text, default_key):
+        """Parse argument text for a list of aids.
+
+        Like parse_aid(), but accepts comma separated lists, and ranges
+        of result numbers.  last_aid is set to the last aid.
+
+        The accepted formats, in order:
+
+        Last AID:                 .
+        Explicit AIDs:            aid:12345,23456
+        Explicit result numbers:  key:1-3,5
+        Default result numbers:   1-3,5
+
+        """
+
+        if default_key not in self:
+            raise ResultKeyError(default_key)
+
+        if text == '.':
+            return [self.last_aid]
+        elif text.startswith('aid:'):
+            try:
+                aids = [int(aid) for aid in text[len('aid:'):].split(',')]
+            except ValueError:
+                raise InvalidSyntaxError(text)
+        else:
+            if ':' in text:
+                match = self._key_list_pattern.search(text)
+                if not match:
+                    raise InvalidSyntaxError(text)
+                key = match.group(1)
+                numbers = match.group(2)
+            else:
+                key = default_key
+                numbers = text
+            aids = [self._get_aid(key, number)
+                    for number in self._parse_numbers(numbers)]
+        self.last_aid = aids[-1]
+        return aids
+
+    def _parse_numbers(self, text):
+        """Parse a comma separated list of numbers and ranges."""
+        numbers = []
+        for part in text.split(','):
+            match = self._range_pattern.search(part)
+            if match:
+                start, stop = int(match.group(1)), int(match.group(2))
+                if start > stop:
+                    raise InvalidSyntaxError(part)
+                numbers.extend(range(start, stop + 1))
+                continue
+            try:
+                numbers.append(int(part))
+            except ValueError:
+                raise InvalidSyntaxError(part)
+        return numbers
+
+    def _get_aid(self, key, number):
+        """Get the aid for a result number."""
         try:
             return self[key].get_aid(number)
         except KeyError:
@@ -15,15 +15,82 @@
 # You should have received a copy of the GNU General Public License
 # along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
 
-from animanager.anidb import request_anime
+from animanager import aioanidb, anidb
+from animanager.cmdlib import ArgumentParser
 from animanager.db import query
 
+# Number of anime written to the database in one transaction.
+_BATCH_SIZE = 50
+
 
 def command(state, args):
-    """Add an anime from an AniDB search."""
-    if len(args) < 2:
-        print(f'Usage: {args[0]} {{ID|aid:AID}}')
+    """Add anime from an AniDB search."""
+    args = parser.parse_args(args[1:])
+    aids = []
+    for text in args.ids:
+        aids.extend(state.results.parse_aids(text, default_key='anidb'))
+    if args.file:
+        aids.extend(_read_aids(args.file))
+    if not aids:
+        print('Must supply ids.')
+        return
+    # Remove duplicates, keeping the order.
+    aids = list(dict.fromkeys(aids))
+    if state.prefetcher is not None:
+        # Use the cached anime instead of requesting them again.
+        state.prefetcher.wait_for(aids)
+    workers = state.config['anime'].getint('request_workers')
+    aioanidb.run(_add(state, aids, workers, args.no_cache))
+
+
+async def _add(state, aids, workers, refresh):
+    batch = []
+    try:
+        async with aioanidb.AsyncAniDB(state.limiter, workers) as client:
+            async for anime in client.request_anime_many(
+                    aids, state.anime_cache, refresh):
+                batch.append(
+                    (anime, anidb.fetched_time(state.anime_cache, anime.aid)))
+                if len(batch) >= _BATCH_SIZE:
+                    _write(state.db, batch)
+                    batch = []
+    finally:
+        # Keep the anime that were requested before an error.
+        _write(state.db, batch)
+
+
+def _write(db, batch):
+    """Add a batch of anime in one transaction."""
+    if not batch:
         return
-    aid = state.results.parse_aid(args[1], default_key='anidb')
-    anime = request_anime(aid)
-    query.update.add(state.db, anime)
+    with db:
+        for anime, fetched in batch:
+            query.update.add(db, anime, fetched=fetched)
+    for anime, _ in batch:
+        print('Added {} {}'.format(anime.aid, anime.title))
+
+
+def _read_aids(path):
+    """Read aids from a file, one per line.
+
+    Blank lines and lines starting with # are ignored.
+    """
+    aids = []
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                aids.append(int(line))
+    return aids
+
+
+parser = ArgumentParser(prog='add')
+parser.add_argument(
+    'ids', nargs='*',
+    help='Result numbers or aids, like 1-3,5, anidb:2 or aid:123,456.')
+parser.add_argument(
+    '-f', '--file',
+    help='File with an aid on each line.')
+parser.add_argument(
+    '--no-cache', action='store_true',
+    help='Request anime even if they were requested recently.')
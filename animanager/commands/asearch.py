@@ -16,9 +16,14 @@
 # along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
+import itertools
 import re
 
 from animanager.cmdlib import ArgumentParser
+from animanager.titles import rank
+
+_DEFAULT_RANKED_LIMIT = 20
+_DEFAULT_PER_PAGE = 50
 
 
 def command(state, args):
@@ -27,11 +32,43 @@ def command(state, args):
     if not args.query:
         print('Must supply query.')
         return
-    search_query = _compile_re_query(args.query)
-    results = state.titles.search(search_query)
-    results = [(anime.aid, anime.main_title) for anime in results]
-    state.results['anidb'].set(results)
+    if args.page < 1 or args.per_page < 1:
+        print('Page numbers and sizes start from 1.')
+        return
+    if args.normalize:
+        results = state.titles.search_normalized(' '.join(args.query))
+    else:
+        results = state.titles.search(_compile_re_query(args.query))
+    if args.ranked:
+        limit = args.limit
+        if limit is None:
+            limit = _DEFAULT_RANKED_LIMIT
+        results = rank(results, ' '.join(args.query), limit)
+    elif args.limit is not None:
+        results = itertools.islice(results, args.limit)
+    # Get one extra result to check if there is a next page.
+    start = (args.page - 1) * args.per_page
+    page = list(itertools.islice(results, start, start + args.per_page + 1))
+    state.results['anidb'].set(
+        (anime.aid, anime.main_title) for anime in page[:args.per_page])
     state.results['anidb'].print()
+    if len(page) > args.per_page:
+        print(f'More results with --page {args.page + 1}')
+    _prefetch(state, [anime.aid for anime in page[:args.per_page]])
+
+
+def _prefetch(state, aids: 'List[int]') -> None:
+    """Prefetch the top results, so adding them is fast."""
+    count = state.config['anime'].getint('prefetch_results')
+    if state.prefetcher is not None and count > 0:
+        state.prefetcher.prefetch(aids[:count])
+
+
+def _non_negative_int(string: str) -> int:
+    value = int(string)
+    if value < 0:
+        raise argparse.ArgumentTypeError(f'must not be negative: {string}')
+    return value
 
 
 def _compile_re_query(args: 'Iterable[str]') -> 're.Pattern':
@@ -39,4 +76,20 @@ def _compile_re_query(args: 'Iterable[str]') -> 're.Pattern':
 
 
 parser = ArgumentParser(prog='asearch')
-parser.add_argument('query', nargs=argparse.REMAINDER)
+parser.add_argument(
+    '-n', '--normalize', action='store_true',
+    help='Match plain words, ignoring accents, width and punctuation.')
+parser.add_argument(
+    '-r', '--ranked', action='store_true',
+    help='Sort results by how well they match.')
+parser.add_argument(
+    '-l', '--limit', type=_non_negative_int, default=None,
+    help='Maximum number of results.  Defaults to {} for --ranked.'.format(
+        _DEFAULT_RANKED_LIMIT))
+parser.add_argument(
+    '-p', '--page', type=int, default=1,
+    help='Page of results to show.')
+parser.add_argument(
+    '--per-page', type=int, default=_DEFAULT_PER_PAGE,
+    help='Number of results per page.')
+parser.add_argument('query', nargs='*')
@@ -15,20 +15,19 @@
 # You should have received a copy of the GNU General Public License
 # along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
 
-import time
-
-from animanager.anidb import request_anime
+from animanager.cmdlib import ArgumentParser
 from animanager.db import query
+from animanager.jobs import start_job
 
 
 def command(state, args):
     """Fix cache issues caused by schema pre-v4."""
-    if len(args) > 1:
-        print(f'Usage: {args[0]}')
-        return
+    command_line = ' '.join(args)
+    args = parser.parse_args(args[1:])
     db = state.db
-    _refresh_incomplete_anime(db)
+    _refresh_incomplete_anime(state, command_line, args.no_cache)
     _fix_cached_completed(db)
+    _fix_status(db)
 
 
 def _incomplete_anime(db):
@@ -41,13 +40,11 @@ def _incomplete_anime(db):
         yield row[0]
 
 
-def _refresh_incomplete_anime(db):
-    with db:
-        aids = sorted(set(_incomplete_anime(db)))
-    for aid in aids:
-        anime = request_anime(aid)
-        query.update.add(db, anime)
-        time.sleep(3)
+def _refresh_incomplete_anime(state, command_line, refresh):
+    with state.db:
+        aids = sorted(set(_incomplete_anime(state.db)))
+    if aids:
+        start_job(state, command_line, aids, refresh)
 
 
 def _fix_cached_completed(db):
@@ -58,3 +55,17 @@ def _fix_cached_completed(db):
             c2 = db.cursor()
             c2.execute("UPDATE episode SET user_watched=1 WHERE aid=? AND type=1 AND number<=?",
                        (aid, eps))
+
+
+def _fix_status(db):
+    """Recalculate anime status that disagrees with the episodes."""
+    with db:
+        for aid in query.status.check_status(db):
+            print(f'Fixing status of {aid}')
+            query.status.cache_status(db, aid, force=True)
+
+
+parser = ArgumentParser(prog='fix')
+parser.add_argument(
+    '--no-cache', action='store_true',
+    help='Request anime even if they were requested recently.')
@@ -0,0 +1,70 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+
+from tabulate import tabulate
+
+from animanager.cmdlib import ArgumentParser
+from animanager.db import query
+from animanager.jobs import run_job
+
+
+def command(state, args):
+    """List, resume, or cancel unfinished update jobs."""
+    args = parser.parse_args(args[1:])
+    db = state.db
+    if args.action == 'list':
+        print(tabulate(
+            ((job.id, job.command, _format_time(job.created),
+              job.pending, job.done, job.failed)
+             for job in query.jobs.get_jobs(db)),
+            headers=['ID', 'Command', 'Created', 'Pending', 'Done', 'Failed']))
+        return
+    if args.action == 'resume' and args.job is None:
+        job_ids = [job.id for job in query.jobs.get_jobs(db)]
+    elif args.job is None:
+        print('Must supply job ID.')
+        return
+    elif query.jobs.get_job(db, args.job) is None:
+        print(f'No job {args.job}.')
+        return
+    else:
+        job_ids = [args.job]
+    if args.action == 'show':
+        print(tabulate(
+            query.jobs.get_items(db, args.job),
+            headers=['AID', 'State', 'Retries', 'Error']))
+    elif args.action == 'resume':
+        for job_id in job_ids:
+            run_job(state, job_id)
+    elif args.action == 'cancel':
+        with db:
+            query.jobs.delete_job(db, args.job)
+
+
+def _format_time(timestamp: int) -> str:
+    return datetime.datetime.fromtimestamp(timestamp).strftime(
+        '%Y-%m-%d %H:%M')
+
+
+parser = ArgumentParser(prog='jobs')
+parser.add_argument(
+    'action', nargs='?', default='list',
+    choices=['list', 'show', 'resume', 'cancel'],
+    help='Action to take.  resume without a job resumes all jobs.')
+parser.add_argument('job', nargs='?', type=int, help='Job ID.')
@@ -24,3 +24,7 @@ def command(state, args):
     state.cache_manager.setup()
     EpisodeTypes.forget(state.db)
     del state.file_picker
+    info = state.titles.search_cache.info()
+    print(f'Title search cache: {info.hits} hits, {info.misses} misses,'
+          f' {info.currsize}/{info.maxsize} entries')
+    state.titles.search_cache.clear()
@@ -0,0 +1,42 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+from animanager.cmdlib import ArgumentParser
+
+
+def command(state, args):
+    """Refresh cached AniDB titles."""
+    args = parser.parse_args(args[1:])
+    if args.force:
+        ttl = None
+    else:
+        ttl = state.config['anime'].getduration('titles_ttl')
+    diff = state.titles.refresh(ttl=ttl, path=args.file)
+    if diff is None:
+        print('Titles are up to date.')
+        return
+    print('Added {}, changed {}, removed {} anime.'.format(
+        len(diff.added), len(diff.changed), len(diff.removed)))
+
+
+parser = ArgumentParser(prog='refreshtitles')
+parser.add_argument(
+    '-f', '--force', action='store_true',
+    help='Refresh even if the cached titles are recent.')
+parser.add_argument(
+    '--file',
+    help='Read titles from an AniDB titles dump instead of downloading.')
@@ -15,35 +15,31 @@
 # You should have received a copy of the GNU General Public License
 # along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
 
-import time
-
-from animanager.anidb import request_anime
+from animanager import datets
 from animanager.cmdlib import ArgumentParser
 from animanager.db import query
+from animanager.jobs import start_job
 
 
 def command(state, args):
     """Add an anime from an AniDB search."""
+    command_line = ' '.join(args)
     args = parser.parse_args(args[1:])
     if args.watching:
-        rows = query.select.select(state.db, 'regexp IS NOT NULL', [], ['aid'])
-        aids = [anime.aid for anime in rows]
+        aids = query.select.aids_to_update(
+            state.db, 'regexp IS NOT NULL', {}, args.stale)
     elif args.incomplete:
-        rows = query.select.select(state.db, 'enddate IS NULL', [], ['aid'])
-        aids = [anime.aid for anime in rows]
+        aids = query.select.aids_to_update(
+            state.db, 'enddate IS NULL', {}, args.stale)
+    elif args.stale is not None and args.aid is None:
+        aids = query.select.aids_to_update(state.db, '1', {}, args.stale)
     else:
         aid = state.results.parse_aid(args.aid, default_key='db')
         aids = [aid]
     if not aids:
         return
-    anime = request_anime(aids.pop())
-    query.update.add(state.db, anime)
-    print('Updated {} {}'.format(anime.aid, anime.title))
-    for aid in aids:
-        time.sleep(2)
-        anime = request_anime(aid)
-        query.update.add(state.db, anime)
-        print('Updated {} {}'.format(anime.aid, anime.title))
+    # Progress is saved in a job, so an interrupted update can be resumed.
+    start_job(state, command_line, aids, args.no_cache)
 
 
 parser = ArgumentParser(prog='update')
@@ -54,3 +50,12 @@ parser.add_argument(
 parser.add_argument(
     '-w', '--watching', action='store_true',
     help='Update all watching anime.')
+parser.add_argument(
+    '--stale', type=datets.parse_duration, metavar='DURATION',
+    help="""Only update anime that were not fetched within DURATION,
+    like 1d12h.  Finished anime are only updated after {} times
+    DURATION.  Without -i or -w, update all stale anime.""".format(
+        query.select.FINISHED_STALE_FACTOR))
+parser.add_argument(
+    '--no-cache', action='store_true',
+    help='Request anime even if they were requested recently.')
@@ -19,9 +19,12 @@ import configparser
 from pathlib import Path
 import shlex
 
+from animanager import datets
+
 _CONVERTERS = {
     'path': lambda x: Path(x).expanduser(),
     'args': shlex.split,
+    'duration': datets.parse_duration,
 }
 _DEFAULTS = {
     'general': {
@@ -30,6 +33,16 @@ _DEFAULTS = {
     'anime': {
         'database': '~/.animanager/database.db',
         'anidb_cache': '~/.animanager/anidb',
+        'title_store': 'pickle',
+        'search_workers': '1',
+        'search_cache_size': '32',
+        'preload_titles': 'true',
+        'titles_ttl': '1d',
+        'request_interval': '2s',
+        'request_workers': '2',
+        'anime_cache_ttl': '1d',
+        'anime_cache_size': '64',
+        'prefetch_results': '0',
         'watchdir': '~/anime',
         'player': 'mpv',
     },
@@ -18,6 +18,7 @@
 """Date timestamp utilities."""
 
 import datetime
+import re
 
 
 def to_ts(date: datetime.date) -> float:
@@ -39,3 +40,36 @@ def to_date(ts: float) -> datetime.date:
     """
     return datetime.datetime.fromtimestamp(
         ts, tz=datetime.timezone.utc).date()
+
+
+_DURATION_PART = re.compile(r'(\d+)([smhdw])')
+_DURATION_UNITS = {
+    's': 'seconds',
+    'm': 'minutes',
+    'h': 'hours',
+    'd': 'days',
+    'w': 'weeks',
+}
+
+
+def parse_duration(string: str) -> datetime.timedelta:
+    """Parse a duration like 1d12h.
+
+    The units are s, m, h, d, and w, for seconds, minutes, hours, days,
+    and weeks.
+
+    >>> parse_duration('1d12h')
+    datetime.timedelta(days=1, seconds=43200)
+    >>> parse_duration('2w')
+    datetime.timedelta(days=14)
+    >>> parse_duration('1y')
+    Traceback (most recent call last):
+        ...
+    ValueError: Invalid duration '1y'
+    """
+    if not string or _DURATION_PART.sub('', string):
+        raise ValueError(f'Invalid duration {string!r}')
+    duration = datetime.timedelta()
+    for number, unit in _DURATION_PART.findall(string):
+        duration += datetime.timedelta(**{_DURATION_UNITS[unit]: int(number)})
+    return duration
@@ -17,6 +17,7 @@
 
 """Animanager database cache tables."""
 
+from animanager.db.query import status
 from animanager.sqlite import CacheTableSpec, CacheTableManager
 
 
@@ -37,10 +38,12 @@ def _setup(conn):
         FOREIGN KEY (aid) REFERENCES anime(aid)
             ON DELETE CASCADE ON UPDATE CASCADE
     )""")
+    status.create_triggers(conn)
 
 
 def _teardown(conn):
     """CacheTable teardown function."""
+    status.drop_triggers(conn)
     conn.cursor().execute('DROP TABLE IF EXISTS cache_anime')
 
 
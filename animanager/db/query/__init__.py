@@ -17,4 +17,4 @@
 
 # pylint: disable=import-self
 
-from . import eptype, files, select, status, update
+from . import eptype, files, jobs, select, status, update
@@ -31,6 +31,7 @@ class Anime:
     watched_episodes: int = 0
     complete: bool = False
     regexp: str = ''
+    last_fetched: int = 0
     episodes: 'List[Episode]' = ()
 
 
@@ -0,0 +1,123 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Job queries.
+
+A job is a persistent list of anime to request from AniDB, so that long
+running commands can be resumed.  Each item is pending until it is done,
+or until it has failed too many times.
+"""
+
+from collections import namedtuple
+import time
+from typing import Iterable, List, Optional
+
+Job = namedtuple(
+    'Job',
+    ['id', 'command', 'created', 'refresh', 'pending', 'done', 'failed'])
+
+JobItem = namedtuple(
+    'JobItem',
+    ['aid', 'state', 'retries', 'error'])
+
+
+def create_job(db, command: str, aids: Iterable[int],
+               refresh: bool = False) -> int:
+    """Create a job for aids, returning its id.
+
+    If refresh is true, the anime are requested even if they are cached.
+    """
+    with db:
+        cur = db.cursor()
+        cur.execute(
+            'INSERT INTO job (command, created, refresh) VALUES (?, ?, ?)',
+            (command, int(time.time()), int(refresh)))
+        job_id = db.last_insert_rowid()
+        cur.executemany(
+            'INSERT OR IGNORE INTO job_item (job_id, aid) VALUES (?, ?)',
+            ((job_id, aid) for aid in aids))
+    return job_id
+
+
+def get_jobs(db) -> List[Job]:
+    """Get jobs with counts of their items by state."""
+    cur = db.cursor()
+    cur.execute("""
+        SELECT job.id, command, created, refresh,
+            TOTAL(state='pending'), TOTAL(state='done'), TOTAL(state='failed')
+        FROM job LEFT JOIN job_item ON job.id=job_item.job_id
+        GROUP BY job.id
+        ORDER BY job.id""")
+    return [Job(job_id, command, created, bool(refresh),
+                int(pending), int(done), int(failed))
+            for job_id, command, created, refresh, pending, done, failed
+            in cur]
+
+
+def get_job(db, job_id: int) -> Optional[Job]:
+    """Get a job, or None if it does not exist."""
+    for job in get_jobs(db):
+        if job.id == job_id:
+            return job
+    return None
+
+
+def get_items(db, job_id: int) -> List[JobItem]:
+    """Get the items of a job."""
+    cur = db.cursor()
+    cur.execute(
+        """SELECT aid, state, retries, error FROM job_item
+        WHERE job_id=? ORDER BY rowid""",
+        (job_id,))
+    return [JobItem(*row) for row in cur]
+
+
+def get_pending_aids(db, job_id: int) -> List[int]:
+    """Get the aids of pending items of a job."""
+    cur = db.cursor()
+    cur.execute(
+        """SELECT aid FROM job_item
+        WHERE job_id=? AND state='pending' ORDER BY rowid""",
+        (job_id,))
+    return [row[0] for row in cur]
+
+
+def finish_item(db, job_id: int, aid: int) -> None:
+    """Mark a job item as done."""
+    db.cursor().execute(
+        "UPDATE job_item SET state='done' WHERE job_id=? AND aid=?",
+        (job_id, aid))
+
+
+def fail_item(db, job_id: int, aid: int, error: str, max_retries: int) -> None:
+    """Record a failure of a job item.
+
+    The item stays pending until it has been retried max_retries times.
+    """
+    db.cursor().execute(
+        """UPDATE job_item
+        SET retries=retries + 1, error=:error,
+            state=CASE WHEN retries + 1 > :max_retries
+                THEN 'failed' ELSE 'pending' END
+        WHERE job_id=:job_id AND aid=:aid""",
+        {'job_id': job_id, 'aid': aid, 'error': error,
+         'max_retries': max_retries})
+
+
+def delete_job(db, job_id: int) -> None:
+    """Delete a job and its items."""
+    db.cursor().execute('DELETE FROM job WHERE id=?', (job_id,))
@@ -17,11 +17,18 @@
 
 """Select type queries."""
 
+import datetime
+import itertools
 import logging
-from typing import Any, Iterable, Iterator, Mapping, Sequence, Union
+import time
+from typing import (
+    Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Union,
+)
+
+from animanager.sqlite.utils import chunks
 
 from .collections import Anime, Episode
-from .status import STATUS_FIELDS, cache_status
+from .status import STATUS_FIELDS
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +42,7 @@ ANIME_FIELDS = {
     'startdate': 'startdate',
     'enddate': 'enddate',
     'regexp': 'regexp',
+    'last_fetched': 'last_fetched',
 }
 ANIME_FIELDS.update(STATUS_FIELDS)
 
@@ -86,9 +94,9 @@ def select(
     trusted values for `where_query`.
 
     This will "lazily" fetch the requested fields as needed.  For example,
-    episodes (which require a separate query per anime) will only be fetched if
-    `episode_fields` is provided.  Anime status will be cached only if status
-    fields are requested.
+    episodes (which require a separate query per chunk of anime) will only be
+    fetched if `episode_fields` is provided.  Anime status is maintained by
+    triggers, so it is always up to date.
 
     :param str where_query: SELECT WHERE query
     :param where_params: parameters for WHERE query
@@ -108,13 +116,6 @@ def select(
     fields = _clean_fields(ANIME_FIELDS, fields)
     if not fields:
         raise ValueError('Fields cannot be empty')
-    if set(fields) & STATUS_FIELDS.keys():
-        cur = db.cursor().execute(
-            ANIME_QUERY.format('aid', where_query),
-            where_params)
-        for row in cur:
-            cache_status(db, row[0])
-
     if 'aid' in fields:
         episode_fields = _clean_fields(EPISODE_FIELDS, episode_fields)
     else:
@@ -126,25 +127,49 @@ def select(
             where_query,
         )
         anime_rows = db.cursor().execute(anime_query, where_params)
-        for row in anime_rows:
-            anime = Anime(**{
+        anime_list = (
+            Anime(**{
                 field: value
                 for field, value in zip(fields, row)})
-
-            if episode_fields:
-                episode_query = 'SELECT {} FROM episode WHERE aid=?'
-                episode_query = episode_query.format(
-                    ','.join(EPISODE_FIELDS[field] for field in episode_fields))
-
-                episode_rows = db.cursor().execute(episode_query, (anime.aid,))
-                episodes = [
-                    Episode(**{
-                        field: value
-                        for field, value in zip(episode_fields, row)})
-                    for row in episode_rows]
-                anime.episodes = episodes
-
-            yield anime
+            for row in anime_rows)
+        if not episode_fields:
+            yield from anime_list
+            return
+        # Episodes are loaded for chunks of anime at once, instead of
+        # with one query per anime.
+        for chunk in chunks(anime_list, _EPISODE_CHUNK_SIZE):
+            episodes = _select_episodes(
+                db, [anime.aid for anime in chunk], episode_fields)
+            for anime in chunk:
+                anime.episodes = episodes.get(anime.aid, [])
+                yield anime
+
+
+# Number of anime whose episodes are loaded at once by select.  This
+# keeps queries under SQLite's default limit of 999 parameters.
+_EPISODE_CHUNK_SIZE = 500
+
+
+def _select_episodes(
+        db,
+        aids: Sequence[int],
+        episode_fields: Iterable[str],
+) -> Dict[int, List[Episode]]:
+    """Select episodes for anime, returning a dict keyed by aid."""
+    episode_query = """
+        SELECT aid, {} FROM episode WHERE aid IN ({})
+        ORDER BY aid, type, number""".format(
+            ','.join(EPISODE_FIELDS[field] for field in episode_fields),
+            ','.join('?' for _ in aids))
+    episode_rows = db.cursor().execute(episode_query, aids)
+    episodes = {}
+    for aid, rows in itertools.groupby(episode_rows, key=lambda row: row[0]):
+        episodes[aid] = [
+            Episode(**{
+                field: value
+                for field, value in zip(episode_fields, row[1:])})
+            for row in rows]
+    return episodes
 
 
 def lookup(
@@ -167,3 +192,58 @@ def lookup(
         fields=fields,
         episode_fields=episode_fields,
     ))
+
+
+# Anime that had finished airing when they were last fetched are only
+# stale after this many times the usual duration, since they rarely
+# change.
+FINISHED_STALE_FACTOR = 8
+
+_UPDATE_QUERY = """
+    SELECT aid
+    FROM anime
+        LEFT JOIN watching USING (aid)
+    WHERE ({}) AND (
+        :stale IS NULL
+        OR last_fetched IS NULL
+        OR last_fetched < :now - :stale * (
+            CASE WHEN enddate < last_fetched THEN :factor ELSE 1 END))
+    ORDER BY
+        CASE
+            WHEN startdate <= :now AND (enddate IS NULL OR enddate >= :now)
+                THEN 0
+            WHEN enddate IS NULL OR enddate >= :now THEN 1
+            ELSE 2
+        END,
+        last_fetched IS NOT NULL,
+        last_fetched"""
+
+
+def aids_to_update(
+        db,
+        where_query: str,
+        where_params: Mapping[str, Any],
+        stale: Optional[datetime.timedelta] = None,
+        now: Optional[float] = None,
+) -> List[int]:
+    """Get aids of anime to update, in order of priority.
+
+    Anime that are airing come first, then anime that have not aired
+    yet, then finished anime.  Within those, anime that were fetched
+    longest ago come first.
+
+    :param str where_query: SELECT WHERE query, like for :func:`select`
+    :param where_params: named parameters for WHERE query
+    :param stale: if given, only get anime that were not fetched within
+        this duration; see :const:`FINISHED_STALE_FACTOR`
+    :param now: current timestamp, for testing
+
+    """
+    params = dict(where_params)
+    params.update({
+        'now': time.time() if now is None else now,
+        'stale': None if stale is None else stale.total_seconds(),
+        'factor': FINISHED_STALE_FACTOR,
+    })
+    cur = db.cursor().execute(_UPDATE_QUERY.format(where_query), params)
+    return [row[0] for row in cur]
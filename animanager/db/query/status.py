@@ -15,13 +15,16 @@
 # You should have received a copy of the GNU General Public License
 # along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
 
-"""Status related queries."""
+"""Status related queries.
 
-from typing import Any, Iterator
+Anime status is kept in cache_anime.  It is maintained by triggers on
+episode and anime, which are created with the cache table; see
+:func:`create_triggers`.
+"""
 
-from animanager.sqlite.utils import upsert
+from typing import Any, Iterator, List, Tuple
 
-from .eptype import get_eptype
+from animanager.sqlite.utils import upsert
 
 STATUS_FIELDS = {
     'complete': 'complete',
@@ -43,32 +46,163 @@ def cache_status(db, aid, force=False):
             cur.execute('SELECT 1 FROM cache_anime WHERE aid=?', (aid,))
             if cur.fetchone() is not None:
                 return
+        cache_status_many(db, 'SELECT ?', (aid,), force=True)
+        if db.changes() == 0:
+            raise ValueError('aid provided does not exist')
+
+
+# The last consecutive watched episode is the episode before the first
+# unwatched episode, or the last episode if all are watched.
+_CACHE_STATUS_QUERY = """
+    INSERT INTO cache_anime (aid, complete, watched_episodes)
+    SELECT aid,
+        enddate IS NOT NULL AND episodecount <= IFNULL(watched, 0),
+        IFNULL(watched, 0)
+    FROM anime
+        LEFT JOIN (
+            SELECT aid, IFNULL(
+                MIN(CASE WHEN user_watched=0 THEN number END) - 1,
+                MAX(number)) AS watched
+            FROM episode
+                JOIN episode_type ON episode.type=episode_type.id
+            WHERE episode_type.name='regular'
+            GROUP BY aid
+        ) USING (aid)
+    WHERE aid IN ({}) {}
+    ON CONFLICT (aid) DO {}"""
+
+
+def cache_status_many(db, aid_query: str, params, force=False) -> None:
+    """Calculate and cache status for many anime at once.
+
+    aid_query is an SQL SELECT of the aids of the anime, with params.
+    Only anime without a cached status are calculated, unless force is
+    True.  The status is calculated and stored in a single statement.
+
+    """
+    if force:
+        query = _CACHE_STATUS_QUERY.format(
+            aid_query, '',
+            """UPDATE SET complete=excluded.complete,
+            watched_episodes=excluded.watched_episodes""")
+    else:
+        query = _CACHE_STATUS_QUERY.format(
+            aid_query, 'AND aid NOT IN (SELECT aid FROM cache_anime)',
+            'NOTHING')
+    db.cursor().execute(query, params)
+
+
+# Status of a single anime, for triggers.  This finds the first
+# unwatched episode with the episode index, so a trigger only reads the
+# watched episodes before it instead of all episodes.
+_TRIGGER_STATUS_QUERY = """
+    INSERT INTO cache_anime (aid, complete, watched_episodes)
+    SELECT aid, enddate IS NOT NULL AND episodecount <= watched, watched
+    FROM (
+        SELECT aid, episodecount, enddate, IFNULL(
+            (SELECT number - 1 FROM episode
+            WHERE episode.aid=anime.aid AND type=(
+                SELECT id FROM episode_type WHERE name='regular')
+            AND user_watched=0
+            ORDER BY number LIMIT 1),
+            (SELECT IFNULL(MAX(number), 0) FROM episode
+            WHERE episode.aid=anime.aid AND type=(
+                SELECT id FROM episode_type WHERE name='regular'))
+        ) AS watched
+        FROM anime
+        WHERE aid IN ({}))
+    WHERE 1
+    ON CONFLICT (aid) DO UPDATE SET complete=excluded.complete,
+        watched_episodes=excluded.watched_episodes"""
+
+# Trigger names and (event, aids) for the triggers.
+_TRIGGERS = {
+    'cache_anime_anime_insert': ('INSERT ON anime', 'NEW.aid'),
+    'cache_anime_anime_update': (
+        'UPDATE OF episodecount, enddate ON anime', 'NEW.aid'),
+    'cache_anime_episode_insert': ('INSERT ON episode', 'NEW.aid'),
+    'cache_anime_episode_update': (
+        'UPDATE OF aid, type, number, user_watched ON episode',
+        'OLD.aid, NEW.aid'),
+    'cache_anime_episode_delete': ('DELETE ON episode', 'OLD.aid'),
+}
+
+
+def create_triggers(db) -> None:
+    """Create triggers that maintain anime status.
+
+    If the triggers did not exist, the status of all anime is
+    calculated, since it was not maintained until now.
 
-        # Retrieve information for determining complete.
+    """
+    cur = db.cursor()
+    cur.execute(
+        "SELECT name FROM sqlite_master WHERE type='trigger' AND name=?",
+        ('cache_anime_episode_insert',))
+    if cur.fetchone() is not None:
+        return
+    for name, (event, aids) in _TRIGGERS.items():
         cur.execute(
-            'SELECT episodecount, enddate FROM anime WHERE aid=?', (aid,))
-        row = cur.fetchone()
-        if row is None:
-            raise ValueError('aid provided does not exist')
-        episodecount, enddate = row
-
-        # Select all regular episodes in ascending order.
-        cur.execute("""
-            SELECT number, user_watched FROM episode
-            WHERE aid=? AND type=?
-            ORDER BY number ASC
-            """, (aid, get_eptype(db, 'regular').id))
-
-        # We find the last consecutive episode that is user_watched.
-        number = 0
-        for number, watched in cur:
-            # Once we find the first unwatched episode, we set the last
-            # consecutive watched episode to the previous episode (or 0).
-            if watched == 0:
-                number -= 1
-                break
-        # We store this in the cache.
-        set_status(db, aid, enddate and episodecount <= number, number)
+            'CREATE TRIGGER {} AFTER {} BEGIN {}; END'.format(
+                name, event, _TRIGGER_STATUS_QUERY.format(aids)))
+    cache_status_many(db, 'SELECT aid FROM anime', (), force=True)
+
+
+def drop_triggers(db) -> None:
+    """Drop triggers that maintain anime status."""
+    cur = db.cursor()
+    for name in _TRIGGERS:
+        cur.execute('DROP TRIGGER IF EXISTS {}'.format(name))
+
+
+def compute_status(db, aid) -> Tuple[bool, int]:
+    """Compute status for given anime without the cache.
+
+    This is the reference for the status kept in the cache.  Return
+    complete and watched_episodes.
+
+    """
+    cur = db.cursor()
+    cur.execute(
+        'SELECT episodecount, enddate FROM anime WHERE aid=?', (aid,))
+    row = cur.fetchone()
+    if row is None:
+        raise ValueError('aid provided does not exist')
+    episodecount, enddate = row
+
+    # Select all regular episodes in ascending order.
+    cur.execute("""
+        SELECT number, user_watched FROM episode
+        WHERE aid=? AND type=(SELECT id FROM episode_type WHERE name=?)
+        ORDER BY number ASC
+        """, (aid, 'regular'))
+
+    # We find the last consecutive episode that is user_watched.
+    number = 0
+    for number, watched in cur:
+        # Once we find the first unwatched episode, we set the last
+        # consecutive watched episode to the previous episode (or 0).
+        if watched == 0:
+            number -= 1
+            break
+    return bool(enddate and episodecount <= number), number
+
+
+def check_status(db) -> List[int]:
+    """Check cached anime status against :func:`compute_status`.
+
+    Return the aids of anime whose cached status is missing or wrong.
+
+    """
+    cur = db.cursor()
+    cur.execute("""
+        SELECT aid, complete, watched_episodes
+        FROM anime LEFT JOIN cache_anime USING (aid)
+        ORDER BY aid""")
+    return [
+        aid for aid, complete, watched_episodes in cur
+        if complete is None
+        or (bool(complete), watched_episodes) != compute_status(db, aid)]
 
 
 def set_status(
@@ -15,22 +15,44 @@
 # You should have received a copy of the GNU General Public License
 # along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
 
+import collections.abc
+import hashlib
+import json
 import logging
+import time
+from typing import Dict, List, Tuple
 
 from animanager import datets
-from animanager.sqlite.utils import upsert
+from animanager.anidb import episodes_digest
+from animanager.sqlite.utils import chunks, upsert, upsert_many
 
 from .eptype import get_eptype
-from .select import ALL, lookup
-from .status import cache_status, set_status
+from .select import lookup
 
 logger = logging.getLogger(__name__)
 
+# Number of episodes written or deleted at once by add.
+_EPISODE_CHUNK_SIZE = 500
 
-def add(db, anime):
+
+def add(db, anime, episodes=None, fetched=None, digest=None):
     """Add an anime (or update existing).
 
-    anime is an AnimeTree instance.
+    anime is an :class:`animanager.anidb.Anime` instance.  episodes are
+    its episodes, by default anime.episodes.  They may be a sequence,
+    an :class:`animanager.anidb.EpisodeStream`, or any iterable.
+
+    A hash of the added data is stored, and only the fetch time is
+    written if the anime has not changed since it was last added.
+    digest is the :func:`animanager.anidb.episodes_digest` of the
+    episodes, if it is already known.  Otherwise the episodes are
+    iterated once to hash them and again to write them.  An
+    EpisodeStream can be iterated twice without keeping the episodes in
+    memory, but any other iterator is read into a list first, so pass
+    its digest to write it without holding it in memory.
+
+    fetched is the timestamp of when the anime was requested from
+    AniDB, by default now.
 
     """
     aid = anime.aid
@@ -44,42 +66,86 @@ def add(db, anime):
         values['startdate'] = datets.to_ts(anime.startdate)
     if anime.enddate is not None:
         values['enddate'] = datets.to_ts(anime.enddate)
+    if episodes is None:
+        episodes = anime.episodes
+    if digest is None:
+        if isinstance(episodes, collections.abc.Iterator):
+            episodes = list(episodes)
+        digest = episodes_digest(episodes)
+    content_hash = _content_hash(values, digest)
+    last_fetched = int(time.time() if fetched is None else fetched)
     with db:
-        upsert(db, 'anime', ['aid'], values)
-        our_anime = lookup(db, anime.aid, episode_fields=ALL)
-        our_episodes = our_anime.episodes
-        for episode in anime.episodes:
-            add_episode(db, aid, episode)
-            our_episodes = [
-                ep for ep in our_episodes
-                if not (ep.type == episode.type and ep.number == episode.number)
-            ]
+        if _get_content_hash(db, aid) == content_hash:
+            db.cursor().execute(
+                'UPDATE anime SET last_fetched=? WHERE aid=?',
+                (last_fetched, aid))
+            return
+        upsert(db, 'anime', ['aid'], dict(values, last_fetched=last_fetched))
+        our_episodes = _get_episode_ids(db, aid)
+        added = add_episodes(db, aid, episodes)
         # Remove extra episodes that we have.
-        for episode in our_episodes:
-            delete_episode(db, aid, episode)
+        _delete_episode_ids(db, [
+            episode_id for key, episode_id in our_episodes.items()
+            if key not in added])
+        upsert(db, 'anime_hash', ['aid'], {'aid': aid, 'hash': content_hash})
 
 
-def add_episode(db, aid, episode):
-    """Add an episode."""
-    values = {
-        'aid': aid,
-        'type': episode.type,
-        'number': episode.number,
-        'title': episode.title,
-        'length': episode.length,
-    }
-    upsert(db, 'episode', ['aid', 'type', 'number'], values)
+def _content_hash(values, digest: bytes) -> bytes:
+    """Hash the anime data written by add.
 
+    digest is the hash of the episodes.  Only the data that is stored
+    is hashed, so changes to other fields in AniDB responses, like
+    ratings, do not count as changes.
+    """
+    content_hash = hashlib.sha1()
+    content_hash.update(json.dumps(sorted(values.items())).encode())
+    content_hash.update(digest)
+    return content_hash.digest()
 
-def delete_episode(db, aid, episode):
-    """Delete an episode."""
-    db.cursor().execute(
-        'DELETE FROM episode WHERE aid=:aid AND type=:type AND number=:number',
-        {
+
+def _get_content_hash(db, aid):
+    """Get the stored content hash of an anime, or None."""
+    cur = db.cursor()
+    cur.execute('SELECT hash FROM anime_hash WHERE aid=?', (aid,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def add_episodes(db, aid, episodes):
+    """Add episodes in bulk.
+
+    Episodes are written in chunks as they are iterated.  Return the set
+    of (type, number) keys of the episodes.
+    """
+    keys = set()
+    for chunk in chunks(episodes, _EPISODE_CHUNK_SIZE):
+        rows = [{
             'aid': aid,
             'type': episode.type,
             'number': episode.number,
-        })
+            'title': episode.title,
+            'length': episode.length,
+        } for episode in chunk]
+        upsert_many(db, 'episode', ['aid', 'type', 'number'], rows)
+        keys.update((row['type'], row['number']) for row in rows)
+    return keys
+
+
+def _get_episode_ids(db, aid) -> Dict[Tuple[int, int], int]:
+    """Get episode ids of an anime, keyed by (type, number)."""
+    cur = db.cursor()
+    cur.execute('SELECT type, number, id FROM episode WHERE aid=?', (aid,))
+    return {(type_, number): episode_id for type_, number, episode_id in cur}
+
+
+def _delete_episode_ids(db, episode_ids: List[int]) -> None:
+    """Delete episodes by id."""
+    cur = db.cursor()
+    for chunk in chunks(episode_ids, _EPISODE_CHUNK_SIZE):
+        cur.execute(
+            'DELETE FROM episode WHERE id IN ({})'.format(
+                ','.join('?' for _ in chunk)),
+            chunk)
 
 
 def set_watched(db, aid, ep_type, number):
@@ -101,12 +167,7 @@ def bump(db, aid):
     if anime.complete:
         return
     episode = anime.watched_episodes + 1
-    with db:
-        set_watched(db, aid, get_eptype(db, 'regular').id, episode)
-        set_status(
-            db, aid,
-            anime.enddate and episode >= anime.episodecount,
-            episode)
+    set_watched(db, aid, get_eptype(db, 'regular').id, episode)
 
 
 def reset(db, aid, episode):
@@ -128,4 +189,3 @@ def reset(db, aid, episode):
             """UPDATE episode SET user_watched=:watched
             WHERE aid=:aid AND type=:type AND number>:number""",
             params)
-        cache_status(db, aid, force=True)
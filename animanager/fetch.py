@@ -0,0 +1,117 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Rate limited fetching.
+
+AniDB bans clients that send requests too quickly, so bulk requests are
+scheduled through a token bucket.  Requests are made in worker threads,
+so the caller can process one response while the next request waits for
+its turn.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from typing import Callable, Iterable, Iterator, Optional, Tuple, TypeVar
+
+K = TypeVar('K')
+V = TypeVar('V')
+
+
+class TokenBucket:
+
+    """Thread safe token bucket rate limiter.
+
+    Tokens are added at rate per second, up to capacity.  Each request
+    takes one token.  The bucket starts full.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = capacity
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take a token, waiting until one is available."""
+        wait = self._take()
+        if wait:
+            self._sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """Take a token, waiting in the event loop until one is available.
+
+        If the wait is cancelled, the token is given back.
+        """
+        wait = self._take()
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self._give_back()
+                raise
+
+    def _take(self) -> float:
+        """Take a token, returning how long to wait for it."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # The token is taken now, so concurrent callers queue up
+            # behind this one.
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0
+
+    def _give_back(self) -> None:
+        """Return a token that was taken but not used."""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+
+def fetch_all(
+        fetch: Callable[[K], V],
+        keys: Iterable[K],
+        limiter: Optional[TokenBucket],
+        workers: int = 1,
+) -> Iterator[Tuple[K, V]]:
+    """Call fetch for each key, respecting limiter if given.
+
+    Up to workers calls are made concurrently in threads.  Results are
+    yielded in the order of keys as (key, result) pairs.  If a call
+    raises, the exception is raised when its result is reached and the
+    remaining calls are cancelled.
+    """
+    def limited_fetch(key):
+        if limiter is not None:
+            limiter.acquire()
+        return fetch(key)
+
+    with ThreadPoolExecutor(workers) as executor:
+        futures = [(key, executor.submit(limited_fetch, key)) for key in keys]
+        try:
+            for key, future in futures:
+                yield key, future.result()
+        finally:
+            for _, future in futures:
+                future.cancel()
@@ -0,0 +1,103 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Running resumable anime update jobs."""
+
+import xml.etree.ElementTree as ET
+
+from mir.anidb import api
+
+from animanager import aioanidb, anidb
+from animanager.db import query
+
+# Number of times a failed item is retried before it is given up on.
+MAX_RETRIES = 3
+
+
+def start_job(state, command: str, aids, refresh: bool = False) -> None:
+    """Create a job for updating aids and run it.
+
+    If refresh is true, the anime are requested even if they are cached,
+    also when the job is resumed.
+    """
+    job_id = query.jobs.create_job(state.db, command, aids, refresh)
+    run_job(state, job_id)
+
+
+def run_job(state, job_id: int) -> None:
+    """Request and add the pending anime of a job.
+
+    Progress is saved as each anime is added, so an interrupted job can
+    be resumed.  Anime that AniDB returns an error for are retried on
+    the next run, up to MAX_RETRIES times.  Other errors, like bans,
+    stop the job.  The job is deleted once all of its items are done.
+    """
+    db = state.db
+    workers = state.config['anime'].getint('request_workers')
+    refresh = query.jobs.get_job(db, job_id).refresh
+    skipped = set()
+    while True:
+        aids = [aid for aid in query.jobs.get_pending_aids(db, job_id)
+                if aid not in skipped]
+        if not aids:
+            break
+        try:
+            aioanidb.run(_update(state, job_id, aids, workers, refresh))
+        except anidb.RequestError as e:
+            with db:
+                query.jobs.fail_item(
+                    db, job_id, e.aid, str(e.__cause__), MAX_RETRIES)
+            print(e)
+            if not _can_skip(e.__cause__):
+                print(f'Stopped job {job_id}; resume with: jobs resume {job_id}')
+                return
+            skipped.add(e.aid)
+        except KeyboardInterrupt:
+            print(f'Interrupted job {job_id}; resume with: jobs resume {job_id}')
+            return
+        else:
+            break
+    job = query.jobs.get_job(db, job_id)
+    if job.pending or job.failed:
+        print(f'Job {job_id} has {job.pending} pending and {job.failed}'
+              f' failed anime; see: jobs show {job_id}')
+    else:
+        with db:
+            query.jobs.delete_job(db, job_id)
+
+
+async def _update(state, job_id, aids, workers, refresh):
+    db = state.db
+    async with aioanidb.AsyncAniDB(state.limiter, workers) as client:
+        async for anime, episodes in client.request_anime_many(
+                aids, state.anime_cache, refresh,
+                parse=anidb.parse_anime_stream):
+            with db:
+                query.update.add(
+                    db, anime, episodes,
+                    anidb.fetched_time(state.anime_cache, anime.aid),
+                    episodes.digest)
+                query.jobs.finish_item(db, job_id, anime.aid)
+            print('Updated {} {}'.format(anime.aid, anime.title))
+
+
+def _can_skip(error: Exception) -> bool:
+    """Return whether the rest of a job can go on after error."""
+    if isinstance(error, ET.ParseError):
+        return True
+    return (isinstance(error, api.APIError)
+            and 'banned' not in str(error).lower())
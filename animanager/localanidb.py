@@ -0,0 +1,244 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Local stand-in for the AniDB API.
+
+The stand-in serves recorded responses from a directory:
+
+- anime/AID.xml: anime API responses
+- anime-titles.xml.gz or anime-titles.xml: the titles dump
+
+Like AniDB, it answers requests that come too quickly with a banned
+error.  Recordings can be made from AniDB with the record command:
+
+    python -m animanager.localanidb record DIR AID...
+    python -m animanager.localanidb serve DIR --latency 0.5
+"""
+
+import argparse
+import gzip
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import logging
+import os
+from pathlib import Path
+from socketserver import ThreadingMixIn
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from animanager import anidb
+from animanager.fetch import TokenBucket, fetch_all
+
+logger = logging.getLogger(__name__)
+
+_API_PATH = '/httpapi'
+_TITLES_PATH = '/api/anime-titles.xml.gz'
+
+
+class LocalAniDB(ThreadingMixIn, HTTPServer):
+
+    """Local AniDB API server.
+
+    directory contains the recorded responses.  Each response is delayed
+    by latency seconds.  API requests that come less than min_interval
+    seconds after the previous one get a banned error, like AniDB.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, directory: 'PathLike', latency: float = 0,
+                 min_interval: float = 0, address=('127.0.0.1', 0)):
+        super().__init__(address, _Handler)
+        self.directory = Path(directory)
+        self.latency = latency
+        self.min_interval = min_interval
+        self.connection_count = 0
+        self.request_count = 0
+        self.banned_count = 0
+        self._last_request = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def client(self) -> anidb.Client:
+        """AniDB client that makes requests to this server."""
+        host, port = self.server_address[:2]
+        base = f'http://{host}:{port}'
+        return anidb._CLIENT._replace(
+            url=base + _API_PATH, titles_url=base + _TITLES_PATH)
+
+    def start(self) -> None:
+        """Serve requests in a background thread."""
+        self._thread = threading.Thread(
+            target=self.serve_forever, kwargs={'poll_interval': 0.05},
+            daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop serving requests and close the server."""
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def check_rate(self) -> bool:
+        """Count an API request and return whether it is allowed."""
+        now = time.monotonic()
+        with self._lock:
+            self.request_count += 1
+            allowed = (self._last_request is None
+                       or now - self._last_request >= self.min_interval)
+            self._last_request = now
+            if not allowed:
+                self.banned_count += 1
+        return allowed
+
+    def anime_path(self, aid: int) -> Path:
+        return self.directory / 'anime' / f'{aid}.xml'
+
+    def titles_data(self) -> 'Optional[bytes]':
+        """Return the gzipped titles dump, or None if there is none."""
+        try:
+            return (self.directory / 'anime-titles.xml.gz').read_bytes()
+        except FileNotFoundError:
+            pass
+        try:
+            return gzip.compress(
+                (self.directory / 'anime-titles.xml').read_bytes())
+        except FileNotFoundError:
+            return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    # Keep connections open, so clients can reuse them.
+    protocol_version = 'HTTP/1.1'
+    server: LocalAniDB
+
+    def setup(self):
+        super().setup()
+        with self.server._lock:
+            self.server.connection_count += 1
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        time.sleep(self.server.latency)
+        if url.path == _API_PATH:
+            self._send_api(parse_qs(url.query))
+        elif url.path == _TITLES_PATH:
+            data = self.server.titles_data()
+            if data is None:
+                self.send_error(404)
+            else:
+                self._send(data, 'application/x-gzip')
+        else:
+            self.send_error(404)
+
+    def _send_api(self, params):
+        # AniDB reports errors with a normal response.
+        if not self.server.check_rate():
+            self._send_error_xml('Banned')
+            return
+        if params.get('request') != ['anime'] or 'aid' not in params:
+            self._send_error_xml('unknown request')
+            return
+        try:
+            data = self.server.anime_path(int(params['aid'][0])).read_bytes()
+        except (FileNotFoundError, ValueError):
+            self._send_error_xml('Anime not found')
+        else:
+            self._send(data, 'text/xml')
+
+    def _send_error_xml(self, message: str):
+        self._send(f'<error>{message}</error>'.encode(), 'text/xml')
+
+    def _send(self, data: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug('%s %s', self.address_string(), format % args)
+
+
+def record(directory: 'PathLike', aids: 'Iterable[int]',
+           limiter: TokenBucket, titles: bool = False) -> None:
+    """Record anime API responses, and optionally the titles dump.
+
+    Requests are made with the current client, so they go to AniDB
+    unless :func:`animanager.anidb.set_client` was called.
+    """
+    directory = Path(directory)
+    (directory / 'anime').mkdir(parents=True, exist_ok=True)
+    if titles:
+        limiter.acquire()
+        (directory / 'anime-titles.xml.gz').write_bytes(
+            anidb.request_titles_dump())
+    for aid, text in fetch_all(anidb.request_anime_xml, aids, limiter):
+        # Check that the response is valid before saving it.
+        anidb.parse_anime(text)
+        (directory / 'anime' / f'{aid}.xml').write_text(
+            text, encoding='utf-8')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m animanager.localanidb')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+    serve_parser = subparsers.add_parser('serve', help='Serve recordings.')
+    serve_parser.add_argument('directory')
+    serve_parser.add_argument('--port', type=int, default=8000)
+    serve_parser.add_argument(
+        '--latency', type=float, default=0,
+        help='Seconds to delay each response.')
+    serve_parser.add_argument(
+        '--min-interval', type=float, default=0,
+        help='Ban API requests that come faster than this many seconds.')
+    record_parser = subparsers.add_parser(
+        'record', help='Record responses from AniDB.')
+    record_parser.add_argument('directory')
+    record_parser.add_argument('aids', nargs='*', type=int)
+    record_parser.add_argument(
+        '--titles', action='store_true', help='Record the titles dump.')
+    args = parser.parse_args(argv)
+    if args.command == 'serve':
+        server = LocalAniDB(
+            args.directory, args.latency, args.min_interval,
+            ('127.0.0.1', args.port))
+        print(f'Serving {os.fspath(args.directory)} at {server.client.url}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+    else:
+        record(args.directory, args.aids, TokenBucket(0.5), args.titles)
+
+
+if __name__ == '__main__':
+    main()
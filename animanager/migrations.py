@@ -181,6 +181,51 @@ def _migrate3(conn):
     conn.execute('ALTER TABLE episode_new RENAME TO episode')
 
 
+@manager.migration(3, 4)
+def _migrate4(conn):
+    # Add job tables.
+    conn.execute("""\
+    CREATE TABLE job (
+        id INTEGER,
+        command TEXT NOT NULL,
+        created INTEGER NOT NULL,
+        refresh INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (id)
+    )""")
+    conn.execute("""\
+    CREATE TABLE job_item (
+        job_id INTEGER NOT NULL,
+        aid INTEGER NOT NULL,
+        state TEXT NOT NULL
+            CHECK (state IN ('pending', 'done', 'failed'))
+            DEFAULT 'pending',
+        retries INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        PRIMARY KEY (job_id, aid),
+        FOREIGN KEY (job_id) REFERENCES job (id)
+            ON DELETE CASCADE ON UPDATE CASCADE
+    )""")
+
+
+@manager.migration(4, 5)
+def _migrate5(conn):
+    # Add anime content hashes.
+    conn.execute("""\
+    CREATE TABLE anime_hash (
+        aid INTEGER,
+        hash BLOB NOT NULL,
+        PRIMARY KEY (aid),
+        FOREIGN KEY (aid) REFERENCES anime (aid)
+            ON DELETE CASCADE ON UPDATE CASCADE
+    )""")
+
+
+@manager.migration(5, 6)
+def _migrate6(conn):
+    # Add anime fetch times.
+    conn.execute('ALTER TABLE anime ADD COLUMN last_fetched INTEGER')
+
+
 def _parse_date(string: str) -> datetime.date:
     """Parse an ISO format date (YYYY-mm-dd).
 
@@ -17,4 +17,4 @@
 
 from .cachedview import CachedView
 from .cachetable import CacheTableSpec, CacheTableManager
-from .utils import upsert
+from .utils import upsert, upsert_many
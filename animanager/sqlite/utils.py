@@ -17,15 +17,16 @@
 
 """SQLite utilities."""
 
-
-def _sqlpformat(name):
-    return '{0}=:{0}'.format(name)
+import functools
+import itertools
 
 
 def upsert(db, table, key_cols, update_dict):
     """Fabled upsert for SQLiteDB.
 
-    Perform an upsert based on primary key.
+    Perform an upsert based on primary key.  key_cols must be the
+    primary key or have a unique index, as required by SQLite's
+    ON CONFLICT clause.
 
     :param SQLiteDB db: database
     :param str table: table to upsert into
@@ -33,21 +34,61 @@ def upsert(db, table, key_cols, update_dict):
     :param dict update_dict: key-value pairs to upsert
 
     """
-    with db:
-        cur = db.cursor()
-        cur.execute(
-            'UPDATE {} SET {} WHERE {}'.format(
-                table,
-                ','.join(_sqlpformat(col) for col in update_dict.keys()),
-                ' AND '.join(_sqlpformat(col) for col in key_cols),
-            ),
-            update_dict,
-        )
-        if db.changes() == 0:
-            keys, values = zip(*update_dict.items())
-            cur.execute(
-                'INSERT INTO {} ({}) VALUES ({})'.format(
-                    table,
-                    ','.join(keys),
-                    ','.join('?' for _ in values)),
-                values)
+    upsert_many(db, table, key_cols, [update_dict])
+
+
+def upsert_many(db, table, key_cols, rows):
+    """Upsert many rows.
+
+    Like :func:`upsert`, but for an iterable of dicts, which must all
+    have the same keys.
+
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+    query = _upsert_query(table, tuple(key_cols), tuple(first))
+    db.cursor().executemany(query, itertools.chain([first], rows))
+
+
+@functools.lru_cache(maxsize=None)
+def _upsert_query(table, key_cols, cols):
+    """Make an upsert query.
+
+    Queries are memoized, so the same query string is reused and apsw's
+    statement cache does not need to prepare it again.
+
+    >>> print(_upsert_query('t', ('id',), ('id', 'name')))
+    INSERT INTO t (id,name) VALUES (:id,:name)
+    ON CONFLICT (id) DO UPDATE SET name=excluded.name
+    """
+    update_cols = [col for col in cols if col not in key_cols]
+    if update_cols:
+        action = 'UPDATE SET ' + ','.join(
+            '{0}=excluded.{0}'.format(col) for col in update_cols)
+    else:
+        action = 'NOTHING'
+    return 'INSERT INTO {} ({}) VALUES ({})\nON CONFLICT ({}) DO {}'.format(
+        table,
+        ','.join(cols),
+        ','.join(':' + col for col in cols),
+        ','.join(key_cols),
+        action)
+
+
+def chunks(iterable, size):
+    """Split an iterable into lists of at most size items.
+
+    Items are consumed as needed, so this can be used to write a stream
+    of rows in batches.
+
+    >>> list(chunks(range(5), 2))
+    [[0, 1], [2, 3], [4]]
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,26 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+"""This package contains tools for indexing and searching anime titles."""
+
+from .compact import MmapTitleStore
+from .diff import TitlesDiff, diff_titles
+from .fts import FTSTitleStore
+from .normalize import NormalizedTitleIndex, normalize
+from .rank import rank
+from .store import MemoryTitleStore, TitleStore
+from .trigram import TrigramIndex, fold, required_literals
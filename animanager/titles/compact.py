@@ -0,0 +1,268 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Title store backed by a compact memory mapped file.
+
+The file consists of a header followed by tables of unsigned 32-bit
+integers in native byte order and two UTF-8 blobs:
+
+- header: magic, version, entry count N, title count M, record blob
+  size, folded blob size
+- aids: N entries
+- entry starts: N + 1 title indexes, the titles of entry i are
+  entry_starts[i] to entry_starts[i+1]
+- record offsets: M + 1 offsets into the record blob
+- folded offsets: M + 1 offsets into the folded blob
+- record blob: 'type\\tlang\\ttitle' for each title
+- folded blob: folded title followed by NUL for each title
+
+The folded blob is searched directly for query literals, so only the
+entries containing them get decoded.  Queries without literals need to
+decode every entry; these can be sharded across worker processes, which
+map the same file.
+"""
+
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+import mmap
+import multiprocessing
+import os
+from pathlib import Path
+import struct
+import tempfile
+import weakref
+
+from mir.anidb.anime import AnimeTitle
+from mir.anidb.titles import Titles
+
+from .store import TitleStore
+from .trigram import fold, required_literals
+
+_MAGIC = b'AMTS'
+_VERSION = 1
+_HEADER = struct.Struct('=4sIIIII')
+
+# Smallest number of entries to scan in parallel.
+_MIN_PARALLEL_ENTRIES = 10000
+
+
+class MmapTitleStore(TitleStore):
+
+    """Title store backed by a compact memory mapped file.
+
+    The file is mapped read-only and replaced atomically, so it can be
+    shared by several processes.
+
+    If workers is greater than 1, queries that need to scan every entry
+    are split across that many worker processes.  The workers are
+    started when first needed and shut down by close(), when the file
+    is replaced, or when the store is discarded.
+    """
+
+    def __init__(self, path: 'PathLike', workers: int = 1):
+        self._path = Path(path)
+        self._file = _open(self._path)
+        self._workers = workers
+        self._executor = None
+        self._shutdown = None
+
+    def is_empty(self):
+        return self._file is None or self._file.entry_count == 0
+
+    def modified(self):
+        try:
+            return os.path.getmtime(self._path)
+        except FileNotFoundError:
+            return None
+
+    def close(self) -> None:
+        """Shut down worker processes."""
+        if self._executor is not None:
+            self._shutdown()
+            self._executor = None
+
+    def replace(self, titles_list):
+        self.close()
+        _write(self._path, titles_list)
+        self._file = _open(self._path)
+
+    def update(self, diff, titles_list):
+        # The file cannot be changed in place, so it is rewritten.
+        self.replace(titles_list)
+
+    def candidates(self, query):
+        file = self._file
+        if file is None:
+            return
+        literals = [fold(literal).encode()
+                    for literal in required_literals(query)]
+        if literals:
+            yield from file.search(query, file.find(max(literals, key=len)))
+        elif self._workers > 1 and file.entry_count >= _MIN_PARALLEL_ENTRIES:
+            yield from self._parallel_scan(query, file.entry_count)
+        else:
+            yield from file.search(query, range(file.entry_count))
+
+    def _parallel_scan(self, query, entry_count: int) -> 'Iterable[Titles]':
+        """Scan all entries in worker processes."""
+        if self._executor is None:
+            # Forking copies the locks of other threads, such as the
+            # prefetcher, in whatever state they are in.
+            self._executor = ProcessPoolExecutor(
+                self._workers, mp_context=multiprocessing.get_context('spawn'))
+            self._shutdown = weakref.finalize(self, self._executor.shutdown)
+        shard_size = -(-entry_count // self._workers)
+        futures = [
+            self._executor.submit(
+                _scan_shard, os.fspath(self._path), query,
+                start, start + shard_size)
+            for start in range(0, entry_count, shard_size)
+        ]
+        # Shards are contiguous, so results stay in order.
+        for future in futures:
+            yield from future.result()
+
+
+class _TitleFile:
+
+    """Memory mapped title file."""
+
+    def __init__(self, buf: mmap.mmap):
+        magic, version, entry_count, title_count, records_size, folded_size \
+            = _HEADER.unpack_from(buf)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError('Invalid title file')
+        self.entry_count = entry_count
+        self._buf = buf
+        view = memoryview(buf)
+        pos = _HEADER.size
+        self.aids, pos = _uint_table(view, pos, entry_count)
+        self._entry_starts, pos = _uint_table(view, pos, entry_count + 1)
+        self._record_offsets, pos = _uint_table(view, pos, title_count + 1)
+        self._folded_offsets, pos = _uint_table(view, pos, title_count + 1)
+        self._records = view[pos:pos + records_size]
+        self._folded_start = pos + records_size
+        self._folded_end = self._folded_start + folded_size
+
+    def entry_titles(self, entry: int) -> range:
+        """Return title indexes for entry."""
+        return range(self._entry_starts[entry], self._entry_starts[entry + 1])
+
+    def record(self, title: int) -> 'List[str]':
+        """Decode a title record into type, lang, and title."""
+        start = self._record_offsets[title]
+        end = self._record_offsets[title + 1]
+        return str(self._records[start:end], 'utf-8').split('\t', 2)
+
+    def search(self, query: 're.Pattern', entries: 'Iterable[int]'):
+        """Decode the given entries that match query as Titles."""
+        for i in entries:
+            records = [self.record(j) for j in self.entry_titles(i)]
+            if any(query.search(record[2]) for record in records):
+                yield Titles(
+                    aid=self.aids[i],
+                    titles=tuple(
+                        AnimeTitle(title=title, type=type_, lang=lang or None)
+                        for type_, lang, title in records),
+                )
+
+    def find(self, literal: bytes) -> 'Iterable[int]':
+        """Find entries whose folded titles contain literal."""
+        pos = self._folded_start
+        while True:
+            hit = self._buf.find(literal, pos, self._folded_end)
+            if hit < 0:
+                return
+            title = bisect_right(
+                self._folded_offsets, hit - self._folded_start) - 1
+            entry = bisect_right(self._entry_starts, title) - 1
+            yield entry
+            next_title = self._entry_starts[entry + 1]
+            pos = self._folded_start + self._folded_offsets[next_title]
+
+
+# Title files opened by a worker process, by path.
+_worker_files = {}
+
+
+def _scan_shard(path: str, query, start: int, stop: int) -> 'List[Titles]':
+    """Scan a range of entries in a worker process."""
+    stat = os.stat(path)
+    key = (stat.st_ino, stat.st_mtime_ns)
+    cached = _worker_files.get(path)
+    if cached is None or cached[0] != key:
+        cached = _worker_files[path] = (key, _open(Path(path)))
+    file = cached[1]
+    if file is None:
+        return []
+    entries = range(start, min(stop, file.entry_count))
+    return list(file.search(query, entries))
+
+
+def _uint_table(view: memoryview, pos: int, length: int):
+    """Return a table of unsigned ints and the position after it."""
+    end = pos + length * 4
+    return view[pos:end].cast('I'), end
+
+
+def _open(path: Path) -> 'Optional[_TitleFile]':
+    """Open a title file, returning None if it is missing or invalid."""
+    try:
+        with path.open('rb') as file:
+            buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None
+    try:
+        return _TitleFile(buf)
+    except (ValueError, struct.error):
+        buf.close()
+        return None
+
+
+def _write(path: Path, titles_list: 'Iterable[Titles]') -> None:
+    """Write a title file atomically."""
+    aids = array('I')
+    entry_starts = array('I', [0])
+    record_offsets = array('I', [0])
+    folded_offsets = array('I', [0])
+    records = bytearray()
+    folded = bytearray()
+    for titles in titles_list:
+        aids.append(titles.aid)
+        for title in titles.titles:
+            records += '\t'.join(
+                (title.type, title.lang or '', title.title)).encode()
+            record_offsets.append(len(records))
+            folded += fold(title.title).encode() + b'\0'
+            folded_offsets.append(len(folded))
+        entry_starts.append(len(record_offsets) - 1)
+    header = _HEADER.pack(
+        _MAGIC, _VERSION, len(aids), len(record_offsets) - 1,
+        len(records), len(folded))
+    fd, tmp = tempfile.mkstemp(dir=os.fspath(path.parent), prefix=path.name)
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(header)
+            for table in (aids, entry_starts, record_offsets, folded_offsets):
+                file.write(table.tobytes())
+            file.write(records)
+            file.write(folded)
+        os.replace(tmp, os.fspath(path))
+    except BaseException:
+        os.unlink(tmp)
+        raise
@@ -0,0 +1,55 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Differences between AniDB titles dumps."""
+
+from typing import Iterable, List, NamedTuple
+
+
+class TitlesDiff(NamedTuple):
+    added: 'List[Titles]'
+    changed: 'List[Titles]'
+    removed: List[int]
+
+
+def diff_titles(
+        old: 'Iterable[Titles]',
+        new: 'Iterable[Titles]',
+) -> TitlesDiff:
+    """Compare two titles dumps by aid.
+
+    >>> from mir.anidb.titles import Titles
+    >>> old = [Titles(1, ('a',)), Titles(2, ('b',)), Titles(3, ('c',))]
+    >>> new = [Titles(1, ('a',)), Titles(3, ('C',)), Titles(4, ('d',))]
+    >>> diff = diff_titles(old, new)
+    >>> diff.added
+    [Titles(aid=4, titles=('d',))]
+    >>> diff.changed
+    [Titles(aid=3, titles=('C',))]
+    >>> diff.removed
+    [2]
+    """
+    old_by_aid = {titles.aid: titles for titles in old}
+    added = []
+    changed = []
+    for titles in new:
+        old_titles = old_by_aid.pop(titles.aid, None)
+        if old_titles is None:
+            added.append(titles)
+        elif old_titles != titles:
+            changed.append(titles)
+    return TitlesDiff(added, changed, sorted(old_by_aid))
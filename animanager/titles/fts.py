@@ -0,0 +1,155 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Title store backed by an SQLite FTS5 table.
+
+Titles are kept in a separate SQLite database so they persist across
+sessions without being loaded into memory.  The FTS5 table uses the
+trigram tokenizer, which requires SQLite 3.34 or newer.
+"""
+
+import itertools
+import os
+
+import apsw
+from mir.anidb.anime import AnimeTitle
+from mir.anidb.titles import Titles
+
+from .store import TitleStore
+from .trigram import fold, required_literals
+
+
+class FTSTitleStore(TitleStore):
+
+    """Title store backed by an SQLite FTS5 table.
+
+    The FTS5 table holds folded titles, so queries are matched the same
+    way as with :class:`TrigramIndex`.
+    """
+
+    def __init__(self, path: 'PathLike'):
+        self._path = os.fspath(path)
+        self._conn = apsw.Connection(self._path)
+        _setup(self._conn)
+
+    def modified(self):
+        return os.path.getmtime(self._path)
+
+    def is_empty(self):
+        cur = self._conn.cursor()
+        cur.execute('SELECT 1 FROM anime_title LIMIT 1')
+        return cur.fetchone() is None
+
+    def replace(self, titles_list):
+        with self._conn:
+            cur = self._conn.cursor()
+            cur.execute('DELETE FROM anime_title')
+            cur.execute('DELETE FROM anime_title_fts')
+            self._insert(cur, titles_list, 1)
+
+    @staticmethod
+    def _insert(cur, titles_list: 'Iterable[Titles]', first_id: int) -> None:
+        """Insert titles with ids starting from first_id."""
+        rows = list(_title_rows(titles_list, first_id))
+        cur.executemany(
+            """INSERT INTO anime_title (id, aid, title, type, lang)
+            VALUES (?, ?, ?, ?, ?)""",
+            rows)
+        cur.executemany(
+            'INSERT INTO anime_title_fts (rowid, title) VALUES (?, ?)',
+            ((row[0], fold(row[2])) for row in rows))
+
+    def update(self, diff, titles_list):
+        aids = list(itertools.chain(
+            diff.removed, (titles.aid for titles in diff.changed)))
+        with self._conn:
+            cur = self._conn.cursor()
+            for aid in aids:
+                cur.execute(
+                    """DELETE FROM anime_title_fts WHERE rowid IN (
+                        SELECT id FROM anime_title WHERE aid=?)""",
+                    (aid,))
+                cur.execute('DELETE FROM anime_title WHERE aid=?', (aid,))
+            cur.execute('SELECT IFNULL(MAX(id), 0) FROM anime_title')
+            last_id = cur.fetchone()[0]
+            self._insert(
+                cur, itertools.chain(diff.changed, diff.added), last_id + 1)
+
+    def candidates(self, query):
+        literals = [literal for literal in required_literals(query)
+                    if len(literal) >= 3]
+        cur = self._conn.cursor()
+        if literals:
+            cur.execute(
+                """SELECT aid, title, type, lang FROM anime_title
+                WHERE aid IN (
+                    SELECT aid FROM anime_title WHERE id IN (
+                        SELECT rowid FROM anime_title_fts
+                        WHERE anime_title_fts MATCH ?))
+                ORDER BY id""",
+                (' AND '.join(_fts_string(fold(x)) for x in literals),))
+        else:
+            cur.execute(
+                'SELECT aid, title, type, lang FROM anime_title ORDER BY id')
+        for aid, rows in itertools.groupby(cur, key=lambda row: row[0]):
+            yield Titles(
+                aid=aid,
+                titles=tuple(AnimeTitle(title=title, type=type_, lang=lang)
+                             for _, title, type_, lang in rows),
+            )
+
+
+def _setup(conn):
+    """Create title store tables."""
+    cur = conn.cursor()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS anime_title (
+        id INTEGER,
+        aid INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        type TEXT,
+        lang TEXT,
+        PRIMARY KEY (id)
+    )""")
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS anime_title_aid ON anime_title (aid)
+    """)
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS anime_title_fts USING fts5 (
+        title,
+        tokenize='trigram case_sensitive 1'
+    )""")
+
+
+def _title_rows(
+        titles_list: 'Iterable[Titles]',
+        first_id: int,
+) -> 'Iterable[Tuple]':
+    """Make anime_title rows in dump order."""
+    ids = itertools.count(first_id)
+    for titles in titles_list:
+        for title in titles.titles:
+            yield next(ids), titles.aid, title.title, title.type, title.lang
+
+
+def _fts_string(string: str) -> str:
+    """Quote a string for an FTS5 query.
+
+    >>> _fts_string('a"b')
+    '"a""b"'
+    """
+    return '"{}"'.format(string.replace('"', '""'))
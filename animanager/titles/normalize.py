@@ -0,0 +1,79 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Normalized title searching.
+
+Titles and queries are normalized so that searches ignore case, width,
+accents and punctuation.
+"""
+
+import re
+from typing import Iterable
+import unicodedata
+
+from .trigram import TrigramIndex
+
+# Combining Diacritical Marks block.  Other combining marks, like the
+# kana voicing marks, change the meaning of the character and are kept.
+_DIACRITICS = re.compile('[\u0300-\u036f]+')
+_PUNCTUATION = re.compile(r'[\W_]+')
+
+
+def normalize(string: str) -> str:
+    """Normalize a string for searching.
+
+    The string is NFKC normalized and casefolded, accents are stripped,
+    and runs of punctuation and whitespace are collapsed into a space.
+
+    >>> normalize('Ｋ-ＯＮ！！')
+    'k on'
+    >>> normalize('Shōjo Shūmatsu Ryokō')
+    'shojo shumatsu ryoko'
+    >>> normalize('Straße, ガンダム')
+    'strasse ガンダム'
+    """
+    string = unicodedata.normalize('NFKC', string).casefold()
+    string = _DIACRITICS.sub('', unicodedata.normalize('NFD', string))
+    string = unicodedata.normalize('NFC', string)
+    return _PUNCTUATION.sub(' ', string).strip()
+
+
+class NormalizedTitleIndex:
+
+    """Index of normalized titles.
+
+    The normalized titles are computed once and kept in a list parallel
+    to titles_list, with a trigram index over them.
+    """
+
+    def __init__(self, titles_list: 'Iterable[Titles]'):
+        self._titles_list = list(titles_list)
+        self._normalized = [
+            tuple(normalize(title.title) for title in titles.titles)
+            for titles in self._titles_list]
+        self._index = TrigramIndex(self._normalized)
+
+    def search(self, text: str) -> 'Iterable[Titles]':
+        """Find entries matching text after normalization.
+
+        The words of text must appear in order in one of the titles.
+        """
+        query = re.compile('.*'.join(map(re.escape, normalize(text).split())))
+        normalized = self._normalized
+        for i in self._index.candidates(query):
+            if any(query.search(title) for title in normalized[i]):
+                yield self._titles_list[i]
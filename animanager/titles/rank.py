@@ -0,0 +1,143 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Ranking of title search results.
+
+Results are scored against the query text with a tuple, lower being
+better:
+
+- 0 if a title equals the query, 1 if a title starts with the query,
+  otherwise 2
+- edit distance between the query and the title
+- 0 if the title is the main title, otherwise 1
+
+Ties are broken by the order of the results.
+"""
+
+import heapq
+from typing import Iterable, List, Optional, Tuple
+
+from .trigram import fold
+
+Score = Tuple[int, int, int]
+
+_BEST_SCORE = (0, 0, 0)
+
+
+def rank(results: Iterable, text: str, limit: int) -> List:
+    """Return the best results for query text, best first.
+
+    results are objects with main_title and titles attributes, like
+    :class:`animanager.anidb.WorkTitles`.  At most limit results are
+    kept.  results is consumed lazily and iteration stops once no better
+    result can appear.
+
+    >>> from collections import namedtuple
+    >>> Result = namedtuple('Result', 'aid,main_title,titles')
+    >>> results = [
+    ...     Result(1, 'Kanon (2006)', ['Kanon (2006)']),
+    ...     Result(2, 'Kanon', ['Kanon']),
+    ...     Result(3, 'Kanojo', ['Kanojo', 'Kanon?']),
+    ... ]
+    >>> [x.aid for x in rank(results, 'kanon', 2)]
+    [2, 3]
+    """
+    if limit <= 0:
+        return []
+    text = fold(text)
+    # Max heap of (negated score and position, result).
+    heap = []
+    for position, result in enumerate(results):
+        worst = _heap_worst(heap) if len(heap) >= limit else None
+        score = _score(text, result, worst)
+        if score is None:
+            continue
+        item = (tuple(-x for x in score) + (-position,), result)
+        if len(heap) < limit:
+            heapq.heappush(heap, item)
+        else:
+            heapq.heapreplace(heap, item)
+        if len(heap) >= limit and _heap_worst(heap) == _BEST_SCORE:
+            break
+    return [result for _, result in sorted(heap, reverse=True)]
+
+
+def _heap_worst(heap) -> Score:
+    return tuple(-x for x in heap[0][0][:3])
+
+
+def _score(text: str, result, worst: Optional[Score]) -> Optional[Score]:
+    """Score a result.
+
+    Return None if the result cannot beat worst.
+    """
+    best = worst
+    main_title = result.main_title
+    for title in result.titles:
+        main = 0 if title == main_title else 1
+        title = fold(title)
+        if title == text:
+            rank_class = 0
+        elif title.startswith(text):
+            rank_class = 1
+        else:
+            rank_class = 2
+        bound = (rank_class, abs(len(title) - len(text)), main)
+        if best is not None and bound >= best:
+            continue
+        if rank_class < 2:
+            distance = bound[1]
+        elif best is not None and best[0] == 2:
+            distance = edit_distance(text, title, best[1])
+        else:
+            distance = edit_distance(text, title)
+        score = (rank_class, distance, main)
+        if best is None or score < best:
+            best = score
+    if best == worst:
+        return None
+    return best
+
+
+def edit_distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    """Return the Levenshtein distance between two strings.
+
+    If limit is given and the distance is greater than limit, some value
+    greater than limit is returned instead.
+
+    >>> edit_distance('kitten', 'sitting')
+    3
+    >>> edit_distance('kitten', 'sitting', 1)
+    2
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
@@ -0,0 +1,130 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Title stores.
+
+A title store holds the AniDB titles dump (a list of :class:`Titles`)
+and finds the entries that may match a query.
+"""
+
+from abc import ABC, abstractmethod
+
+from .trigram import TrigramIndex
+
+# Fraction of stale entries above which MemoryTitleStore rebuilds its
+# index.
+_MAX_STALE_FRACTION = 0.25
+
+
+class TitleStore(ABC):
+
+    """Abstract base class for title stores."""
+
+    @abstractmethod
+    def is_empty(self) -> bool:
+        """Return whether the store has no titles."""
+
+    @abstractmethod
+    def replace(self, titles_list: 'List[Titles]') -> None:
+        """Replace all titles in the store."""
+
+    @abstractmethod
+    def update(self, diff: 'TitlesDiff', titles_list: 'List[Titles]') -> None:
+        """Apply changes to the titles in the store.
+
+        titles_list is the complete list of titles after the changes,
+        for stores that cannot apply changes in place.
+        """
+
+    @abstractmethod
+    def candidates(self, query: 're.Pattern') -> 'Iterable[Titles]':
+        """Return entries that may match query.
+
+        Entries are returned in the order they were added.  Entries that
+        do not match may be returned, so callers need to check them
+        against the query.
+        """
+
+    def modified(self) -> 'Optional[float]':
+        """Return when the stored titles were last changed.
+
+        This is a timestamp, or None for stores that do not persist
+        titles.
+        """
+        return None
+
+
+class MemoryTitleStore(TitleStore):
+
+    """Title store that keeps titles in memory with a trigram index.
+
+    Changed entries are updated in place, so they keep their order.
+    The index is rebuilt once too many entries are stale, that is,
+    removed or indexed with the trigrams of old titles.
+    """
+
+    def __init__(self):
+        # Removed entries are replaced with None, so positions in the
+        # index stay valid.
+        self._titles_list = []
+        self._positions = {}
+        self._index = TrigramIndex()
+        self._stale = 0
+
+    def is_empty(self):
+        return not self._positions
+
+    def replace(self, titles_list):
+        self._titles_list = list(titles_list)
+        self._positions = {
+            titles.aid: i for i, titles in enumerate(self._titles_list)}
+        self._index = TrigramIndex(
+            [title.title for title in titles.titles]
+            for titles in self._titles_list)
+        self._stale = 0
+
+    def update(self, diff, titles_list):
+        added = list(diff.added)
+        for aid in diff.removed:
+            position = self._positions.pop(aid, None)
+            if position is not None:
+                self._titles_list[position] = None
+                self._stale += 1
+        for titles in diff.changed:
+            position = self._positions.get(titles.aid)
+            if position is None:
+                added.append(titles)
+                continue
+            # The trigrams of the old titles are kept, which only adds
+            # candidates that do not match.
+            self._index.extend(
+                position, [title.title for title in titles.titles])
+            self._titles_list[position] = titles
+            self._stale += 1
+        for titles in added:
+            self._positions[titles.aid] = self._index.add(
+                [title.title for title in titles.titles])
+            self._titles_list.append(titles)
+        if self._stale > len(self._titles_list) * _MAX_STALE_FRACTION:
+            self.replace(titles_list)
+
+    def candidates(self, query):
+        titles_list = self._titles_list
+        for i in self._index.candidates(query):
+            titles = titles_list[i]
+            if titles is not None:
+                yield titles
@@ -0,0 +1,176 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Trigram index for title searching.
+
+The index maps every three character substring of the folded titles to
+the entries that contain it.  A regular expression query is narrowed
+down to candidate entries using the literal strings that any match must
+contain.  Candidates still need to be checked against the query itself.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Iterable, List
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+# Characters that IGNORECASE matches against an ASCII letter, but which
+# do not lowercase to it.
+_FOLD_TABLE = str.maketrans({'\u0131': 'i', '\u017f': 's'})
+
+
+def fold(string: str) -> str:
+    """Fold a string for indexing.
+
+    Any two characters that match each other under IGNORECASE fold to
+    the same character, at least for ASCII and uncased characters.
+
+    >>> fold('Kyoukai no Kanata')
+    'kyoukai no kanata'
+    >>> fold('İıſ')
+    'iis'
+    """
+    # U+0130 is the only character with a multiple character lowercase
+    # mapping.
+    return string.lower().replace('i\u0307', 'i').translate(_FOLD_TABLE)
+
+
+def required_literals(query: 're.Pattern') -> List[str]:
+    """Return literal strings that any match of query must contain.
+
+    Only ASCII and uncased characters are included, so the literals can
+    be folded safely.
+
+    >>> import re
+    >>> required_literals(re.compile('.*'.join(['madoka', 'magica'])))
+    ['madoka', 'magica']
+    >>> required_literals(re.compile('shin(gek)i no ky.jin'))
+    ['shingeki no ky', 'jin']
+    >>> required_literals(re.compile('foo|bar'))
+    []
+    """
+    literals = []
+    run = []
+    for char in _literal_chars(sre_parse.parse(query.pattern, query.flags)):
+        if char is not None and _is_foldable(char):
+            run.append(char)
+        elif run:
+            literals.append(''.join(run))
+            run = []
+    if run:
+        literals.append(''.join(run))
+    return literals
+
+
+def _literal_chars(parsed) -> 'Iterable[Optional[str]]':
+    """Yield the literal characters of a parsed pattern.
+
+    None is yielded for anything that is not a required literal.
+    """
+    for op, arg in parsed:
+        if op == sre_parse.LITERAL:
+            yield chr(arg)
+        elif op == sre_parse.SUBPATTERN:
+            yield from _literal_chars(arg[-1])
+        else:
+            yield None
+
+
+def _is_foldable(char: str) -> bool:
+    return char < '\x80' or char.lower() == char.upper()
+
+
+def _trigrams(string: str) -> 'Iterable[str]':
+    return (string[i:i+3] for i in range(len(string) - 2))
+
+
+class TrigramIndex:
+
+    """Trigram index over entries of strings.
+
+    Entries are identified by their position, in the order they were
+    added.
+
+    >>> import re
+    >>> index = TrigramIndex([['Madoka Magica'], ['Kanon', 'Kanon (2006)']])
+    >>> list(index.candidates(re.compile('magica', re.I)))
+    [0]
+    >>> list(index.candidates(re.compile('k.*n')))
+    [0, 1]
+    """
+
+    def __init__(self, entries: Iterable[Iterable[str]] = ()):
+        self._postings = defaultdict(lambda: array('l'))
+        self._size = 0
+        for strings in entries:
+            self.add(strings)
+
+    def add(self, strings: Iterable[str]) -> int:
+        """Add an entry, returning its position."""
+        position = self._size
+        grams = set()
+        for string in strings:
+            grams.update(_trigrams(fold(string)))
+        for gram in grams:
+            self._postings[gram].append(position)
+        self._size += 1
+        return position
+
+    def extend(self, position: int, strings: Iterable[str]) -> None:
+        """Add strings to an existing entry.
+
+        >>> import re
+        >>> index = TrigramIndex([['Kanon'], ['Kanon (2006)']])
+        >>> index.extend(0, ['Madoka Magica'])
+        >>> list(index.candidates(re.compile('magica', re.I)))
+        [0]
+        """
+        grams = set()
+        for string in strings:
+            grams.update(_trigrams(fold(string)))
+        for gram in grams:
+            posting = self._postings[gram]
+            i = bisect_left(posting, position)
+            if i == len(posting) or posting[i] != position:
+                posting.insert(i, position)
+
+    def __len__(self):
+        return self._size
+
+    def candidates(self, query: 're.Pattern') -> 'Iterable[int]':
+        """Return entries that may match query in ascending order."""
+        grams = set()
+        for literal in required_literals(query):
+            grams.update(_trigrams(fold(literal)))
+        if not grams:
+            return range(self._size)
+        postings = sorted(
+            (self._postings.get(gram, ()) for gram in grams),
+            key=len)
+        return [i for i in postings[0]
+                if all(_contains(posting, i) for posting in postings[1:])]
+
+
+def _contains(posting: 'Sequence[int]', value: int) -> bool:
+    """Check if a sorted sequence contains value."""
+    i = bisect_left(posting, value)
+    return i < len(posting) and posting[i] == value
@@ -55,6 +55,7 @@ setup(
         'mir.anidb~=2.0',
         'mir.cp~=1.0',
         'mir.sqlite3m~=1.0',
+        'requests~=2.0',
         'SQLAlchemy~=1.1',
     ],
     entry_points={
@@ -0,0 +1,61 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+import configparser
+import contextlib
+import importlib
+import io
+
+from animanager.animecmd import State
+from animanager.cmd.results import AIDResults, AIDResultsManager
+from animanager.config import _DEFAULTS
+from animanager.fetch import TokenBucket
+from tests.db import DatabaseTestCase
+from tests.test_localanidb import LocalAniDBMixin
+
+
+class CommandTestCase(LocalAniDBMixin, DatabaseTestCase):
+
+    """Test case for commands, with AniDB requests served locally."""
+
+    def setUp(self):
+        super().setUp()
+        self.local_anidb = self.start_local_anidb()
+        config = configparser.ConfigParser()
+        config.read_dict(_DEFAULTS)
+        self.state = State(
+            config=config,
+            db=self.db,
+            limiter=TokenBucket(1000),
+            results=AIDResultsManager({
+                'db': AIDResults(['Title']),
+                'anidb': AIDResults(['Title'], [(1, 'a'), (2, 'b'), (3, 'c')]),
+            }),
+        )
+
+    def run_command(self, name, *args) -> str:
+        """Run a command, returning its output."""
+        module = importlib.import_module(f'animanager.commands.{name}')
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            module.command(self.state, [name, *args])
+        return output.getvalue()
+
+    def anime_aids(self):
+        cur = self.db.cursor()
+        cur.execute('SELECT aid FROM anime ORDER BY aid')
+        return [row[0] for row in cur]
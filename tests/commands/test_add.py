@@ -0,0 +1,58 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+import os
+import tempfile
+
+from animanager import anidb
+from animanager.anidb import AnimeCache, Prefetcher
+from tests.commands import CommandTestCase
+
+
+class AddTestCase(CommandTestCase):
+
+    def test_add_range(self):
+        self.run_command('add', '1-2')
+        self.assertEqual([1, 2], self.anime_aids())
+
+    def test_add_aids_and_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'aids')
+            with open(path, 'w') as file:
+                file.write('# Seed list\n3\n\n1\n')
+            output = self.run_command('add', 'aid:1,2', '-f', path)
+        self.assertEqual([1, 2, 3], self.anime_aids())
+        self.assertEqual(3, output.count('Added'))
+
+    def test_add_keeps_anime_before_error(self):
+        with self.assertRaises(anidb.RequestError):
+            self.run_command('add', 'aid:1,404,2')
+        self.assertEqual([1], self.anime_aids())
+
+    def test_add_waits_for_prefetch(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.state.anime_cache = AnimeCache(
+            os.path.join(tmpdir.name, 'anime'),
+            datetime.timedelta(days=1), 2**20)
+        self.state.prefetcher = Prefetcher(
+            self.state.anime_cache, self.state.limiter)
+        self.state.prefetcher.prefetch([1])
+        self.run_command('add', 'aid:1')
+        self.assertEqual([1], self.anime_aids())
+        self.assertEqual(1, self.local_anidb.request_count)
@@ -0,0 +1,87 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import pickle
+import tempfile
+from unittest import mock
+
+from mir.anidb.anime import AnimeTitle
+from mir.anidb.titles import Titles
+
+from animanager.anidb import TitleSearcher
+from animanager.cmdlib import CmdExit
+from tests.commands import CommandTestCase
+
+TITLES_LIST = [
+    Titles(aid=aid, titles=(
+        AnimeTitle(title=f'Madoka {aid}', type='main', lang='x-jat'),
+    ))
+    for aid in range(1, 6)
+]
+
+
+class AsearchTestCase(CommandTestCase):
+
+    def setUp(self):
+        super().setUp()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        path = os.path.join(tmpdir.name, 'anime-titles.pickle')
+        with open(path, 'wb') as file:
+            pickle.dump(TITLES_LIST, file)
+        self.state.titles = TitleSearcher(tmpdir.name)
+
+    def _results(self):
+        return [aid for aid, _ in self.state.results['anidb'].results]
+
+    def test_page(self):
+        output = self.run_command('asearch', '--per-page', '2', 'madoka')
+        self.assertEqual([1, 2], self._results())
+        self.assertIn('More results with --page 2', output)
+        output = self.run_command(
+            'asearch', 'madoka', '--per-page', '2', '--page', '3')
+        self.assertEqual([5], self._results())
+        self.assertNotIn('More results', output)
+
+    def test_page_cached(self):
+        self.run_command('asearch', '--per-page', '2', 'madoka')
+        with mock.patch.object(self.state.titles, '_search') as search:
+            self.run_command('asearch', '--per-page', '2', '--page', '2',
+                             'madoka')
+        search.assert_not_called()
+        self.assertEqual([3, 4], self._results())
+
+    def test_prefetch(self):
+        self.state.prefetcher = mock.Mock()
+        self.run_command('asearch', 'madoka')
+        self.state.prefetcher.prefetch.assert_not_called()
+        self.state.config['anime']['prefetch_results'] = '2'
+        self.run_command('asearch', 'madoka')
+        self.state.prefetcher.prefetch.assert_called_once_with([1, 2])
+
+    def test_limit(self):
+        self.run_command('asearch', '-l', '0', 'madoka')
+        self.assertEqual([], self._results())
+        self.run_command('asearch', '-r', '-l', '0', 'madoka')
+        self.assertEqual([], self._results())
+        self.run_command('asearch', '-r', '-l', '2', 'madoka')
+        self.assertEqual(2, len(self._results()))
+
+    def test_negative_limit(self):
+        with self.assertRaises(CmdExit):
+            self.run_command('asearch', '-l', '-1', 'madoka')
@@ -0,0 +1,49 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+import os
+import tempfile
+
+from animanager.anidb import AnimeCache
+from animanager.db import query
+from tests.commands import CommandTestCase
+
+
+class FixTestCase(CommandTestCase):
+
+    def test_fix_status(self):
+        self.run_command('add', '1-2')
+        query.status.set_status(self.db, 2, True, 0)
+        output = self.run_command('fix')
+        self.assertIn('Fixing status of 2', output)
+        self.assertFalse(query.select.lookup(self.db, 2).complete)
+        self.assertEqual([], query.status.check_status(self.db))
+
+    def test_no_cache(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.state.anime_cache = AnimeCache(
+            os.path.join(tmpdir.name, 'anime'),
+            datetime.timedelta(days=1), 2**20)
+        # Anime 3 has not ended, so fix refreshes it.
+        self.run_command('add', '3')
+        self.assertEqual(1, self.local_anidb.request_count)
+        self.run_command('fix')
+        self.assertEqual(1, self.local_anidb.request_count)
+        self.run_command('fix', '--no-cache')
+        self.assertEqual(2, self.local_anidb.request_count)
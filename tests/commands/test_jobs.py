@@ -0,0 +1,96 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+import os
+import shutil
+import tempfile
+
+from animanager.anidb import AnimeCache
+from animanager.db import query
+from tests.commands import CommandTestCase
+from tests.test_localanidb import ANIDB_DATA
+
+
+class JobsTestCase(CommandTestCase):
+
+    def test_update_deletes_finished_job(self):
+        output = self.run_command('update', 'aid:2')
+        self.assertIn('Updated 2', output)
+        self.assertEqual([2], self.anime_aids())
+        self.assertEqual([], query.jobs.get_jobs(self.db))
+
+    def test_update_skips_missing_anime(self):
+        job_id = query.jobs.create_job(self.db, 'update', [1, 404, 2])
+        output = self.run_command('jobs', 'resume')
+        self.assertIn(f'Job {job_id} has 1 pending and 0 failed', output)
+        self.assertEqual([1, 2], self.anime_aids())
+        for _ in range(3):
+            self.run_command('jobs', 'resume')
+        self.assertEqual(
+            [(1, 'done'), (404, 'failed'), (2, 'done')],
+            [(item.aid, item.state)
+             for item in query.jobs.get_items(self.db, job_id)])
+
+    def test_resume_banned_job(self):
+        self.local_anidb.min_interval = 60
+        job_id = query.jobs.create_job(self.db, 'update -w', [1, 2, 3])
+        output = self.run_command('jobs', 'resume', str(job_id))
+        self.assertIn(f'resume with: jobs resume {job_id}', output)
+        self.assertNotEqual([1, 2, 3], self.anime_aids())
+        self.local_anidb.min_interval = 0
+        output = self.run_command('jobs')
+        self.assertIn('update -w', output)
+        self.run_command('jobs', 'resume', str(job_id))
+        self.assertEqual([1, 2, 3], self.anime_aids())
+        self.assertEqual([], query.jobs.get_jobs(self.db))
+
+    def test_update_skips_bad_response(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        directory = os.path.join(tmpdir.name, 'anidb')
+        shutil.copytree(ANIDB_DATA, directory)
+        text = (ANIDB_DATA / 'anime' / '1.xml').read_text()
+        with open(os.path.join(directory, 'anime', '5.xml'), 'w') as file:
+            file.write(text[:-200])
+        self.start_local_anidb(directory)
+        job_id = query.jobs.create_job(self.db, 'update', [5, 2])
+        output = self.run_command('jobs', 'resume')
+        self.assertIn(f'Job {job_id} has 1 pending and 0 failed', output)
+        self.assertEqual([2], self.anime_aids())
+        item, = query.jobs.get_items(self.db, job_id)[:1]
+        self.assertEqual((5, 1), (item.aid, item.retries))
+
+    def test_cancel(self):
+        job_id = query.jobs.create_job(self.db, 'fix', [1])
+        self.run_command('jobs', 'cancel', str(job_id))
+        self.assertEqual([], query.jobs.get_jobs(self.db))
+
+    def test_resume_refresh_job(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.state.anime_cache = AnimeCache(
+            os.path.join(tmpdir.name, 'anime'),
+            datetime.timedelta(days=1), 2**20)
+        self.state.anime_cache.put(
+            1, (ANIDB_DATA / 'anime' / '1.xml').read_text())
+        query.jobs.create_job(self.db, 'update', [1])
+        self.run_command('jobs', 'resume')
+        self.assertEqual(0, self.local_anidb.request_count)
+        query.jobs.create_job(self.db, 'update --no-cache', [1], True)
+        self.run_command('jobs', 'resume')
+        self.assertEqual(1, self.local_anidb.request_count)
@@ -0,0 +1,55 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+import os
+import tempfile
+import time
+
+from animanager.anidb import AnimeCache
+from tests.commands import CommandTestCase
+from tests.test_localanidb import ANIDB_DATA
+
+
+class UpdateTestCase(CommandTestCase):
+
+    def test_stale(self):
+        self.run_command('add', '1-3')
+        self.db.cursor().execute(
+            'UPDATE anime SET last_fetched=0 WHERE aid IN (1, 3)')
+        output = self.run_command('update', '--stale', '1d')
+        self.assertEqual(
+            ['Updated 3', 'Updated 1'],
+            [line[:9] for line in output.splitlines()])
+
+    def test_cached_fetch_time(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        cache = self.state.anime_cache = AnimeCache(
+            tmpdir.name, datetime.timedelta(days=1), 2**20)
+        cache.put(1, (ANIDB_DATA / 'anime' / '1.xml').read_text())
+        fetched = int(time.time()) - 3600
+        os.utime(os.path.join(tmpdir.name, '1.xml.gz'), (fetched, fetched))
+        self.run_command('update', 'aid:1')
+        self.assertEqual(fetched, self._last_fetched(1))
+        self.run_command('update', '--no-cache', 'aid:1')
+        self.assertGreater(self._last_fetched(1), fetched)
+
+    def _last_fetched(self, aid):
+        cur = self.db.cursor()
+        cur.execute('SELECT last_fetched FROM anime WHERE aid=?', (aid,))
+        return cur.fetchone()[0]
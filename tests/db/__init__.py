@@ -0,0 +1,40 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import tempfile
+import unittest
+
+import apsw
+
+from animanager import migrations
+from animanager.db import cachetable
+
+
+class DatabaseTestCase(unittest.TestCase):
+
+    """Test case with a migrated Animanager database in self.db."""
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        path = os.path.join(tmpdir.name, 'database.db')
+        migrations.migrate(path)
+        self.db = apsw.Connection(path)
+        self.addCleanup(self.db.close)
+        self.db.cursor().execute('PRAGMA foreign_keys=1')
+        cachetable.make_manager(self.db).setup()
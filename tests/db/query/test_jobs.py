@@ -0,0 +1,60 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+from animanager.db import query
+from tests.db import DatabaseTestCase
+
+
+class JobsTestCase(DatabaseTestCase):
+
+    def test_create_job(self):
+        job_id = query.jobs.create_job(self.db, 'update -w', [3, 1, 2, 1])
+        self.assertEqual([3, 1, 2], query.jobs.get_pending_aids(self.db, job_id))
+        job = query.jobs.get_job(self.db, job_id)
+        self.assertEqual('update -w', job.command)
+        self.assertEqual((3, 0, 0), (job.pending, job.done, job.failed))
+        self.assertFalse(job.refresh)
+
+    def test_create_refresh_job(self):
+        job_id = query.jobs.create_job(self.db, 'update --no-cache', [1], True)
+        self.assertTrue(query.jobs.get_job(self.db, job_id).refresh)
+
+    def test_finish_item(self):
+        job_id = query.jobs.create_job(self.db, 'fix', [1, 2])
+        query.jobs.finish_item(self.db, job_id, 1)
+        self.assertEqual([2], query.jobs.get_pending_aids(self.db, job_id))
+        job = query.jobs.get_job(self.db, job_id)
+        self.assertEqual((1, 1, 0), (job.pending, job.done, job.failed))
+
+    def test_fail_item(self):
+        job_id = query.jobs.create_job(self.db, 'fix', [1])
+        for _ in range(2):
+            query.jobs.fail_item(self.db, job_id, 1, 'error', 1)
+        self.assertEqual(
+            [query.jobs.JobItem(1, 'failed', 2, 'error')],
+            query.jobs.get_items(self.db, job_id))
+
+    def test_fail_item_retries(self):
+        job_id = query.jobs.create_job(self.db, 'fix', [1])
+        query.jobs.fail_item(self.db, job_id, 1, 'error', 1)
+        self.assertEqual([1], query.jobs.get_pending_aids(self.db, job_id))
+
+    def test_delete_job(self):
+        job_id = query.jobs.create_job(self.db, 'fix', [1])
+        query.jobs.delete_job(self.db, job_id)
+        self.assertIsNone(query.jobs.get_job(self.db, job_id))
+        self.assertEqual([], query.jobs.get_items(self.db, job_id))
@@ -0,0 +1,105 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+from unittest import mock
+
+from animanager import anidb, datets
+from animanager.db import query
+from tests.db import DatabaseTestCase
+from tests.test_localanidb import ANIDB_DATA
+
+DAY = 24 * 60 * 60
+NOW = datets.to_ts(datetime.date(2018, 11, 1))
+
+
+class AidsToUpdateTestCase(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for aid in (1, 2, 3):
+            text = (ANIDB_DATA / 'anime' / f'{aid}.xml').read_text()
+            query.update.add(self.db, anidb.parse_anime(text))
+
+    def _set_last_fetched(self, aid, last_fetched):
+        self.db.cursor().execute(
+            'UPDATE anime SET last_fetched=? WHERE aid=?',
+            (last_fetched, aid))
+
+    def test_order(self):
+        self._set_last_fetched(1, NOW - 2 * DAY)
+        self._set_last_fetched(2, NOW - 3 * DAY)
+        self.assertEqual(
+            [3, 2, 1], query.select.aids_to_update(self.db, '1', {}, now=NOW))
+
+    def test_stale(self):
+        self._set_last_fetched(1, NOW - 2 * DAY)
+        self._set_last_fetched(2, NOW - 10 * DAY)
+        self._set_last_fetched(3, NOW - 2 * DAY)
+        self.assertEqual(
+            [3, 2],
+            query.select.aids_to_update(
+                self.db, '1', {}, datetime.timedelta(days=1), now=NOW))
+
+    def test_stale_finished(self):
+        self._set_last_fetched(1, NOW - 2 * DAY)
+        self._set_last_fetched(2, NOW - 10 * DAY)
+        self._set_last_fetched(3, NOW)
+        self.assertEqual(
+            [2],
+            query.select.aids_to_update(
+                self.db, 'enddate IS NOT NULL', {},
+                datetime.timedelta(days=1), now=NOW))
+
+    def test_never_fetched(self):
+        self._set_last_fetched(1, None)
+        self._set_last_fetched(2, NOW)
+        self._set_last_fetched(3, NOW)
+        self.assertEqual(
+            [1],
+            query.select.aids_to_update(
+                self.db, '1', {},
+                datetime.timedelta(days=1), now=NOW))
+
+
+class SelectTestCase(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for aid in (1, 2, 3):
+            text = (ANIDB_DATA / 'anime' / f'{aid}.xml').read_text()
+            query.update.add(self.db, anidb.parse_anime(text))
+
+    def test_select_episodes(self):
+        anime = list(query.select.select(
+            self.db, '1 ORDER BY anime.aid', [], ['aid'], ['type', 'number']))
+        self.assertEqual([1, 2, 3], [x.aid for x in anime])
+        self.assertEqual([14, 26, 5], [len(x.episodes) for x in anime])
+        self.assertEqual((1, 1), (anime[0].episodes[0].type,
+                                  anime[0].episodes[0].number))
+
+    def test_select_episodes_chunks(self):
+        with mock.patch.object(query.select, '_EPISODE_CHUNK_SIZE', 2):
+            anime = list(query.select.select(
+                self.db, '1 ORDER BY anime.aid', [], ['aid'], ['number']))
+        self.assertEqual([14, 26, 5], [len(x.episodes) for x in anime])
+
+    def test_select_without_episodes(self):
+        self.db.cursor().execute('DELETE FROM episode WHERE aid=2')
+        anime = list(query.select.select(
+            self.db, '1 ORDER BY anime.aid', [], ['aid'], ['number']))
+        self.assertEqual([], anime[1].episodes)
@@ -0,0 +1,113 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+from animanager import anidb
+from animanager.db import cachetable, query
+from tests.db import DatabaseTestCase
+from tests.test_localanidb import ANIDB_DATA
+
+
+class StatusTestCase(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for aid in (1, 2, 3):
+            text = (ANIDB_DATA / 'anime' / f'{aid}.xml').read_text()
+            query.update.add(self.db, anidb.parse_anime(text))
+
+    def _status(self, aid):
+        cur = self.db.cursor()
+        cur.execute(
+            'SELECT watched_episodes, complete FROM cache_anime WHERE aid=?',
+            (aid,))
+        return cur.fetchone()
+
+    def _watch(self, aid, *numbers):
+        for number in numbers:
+            query.update.set_watched(self.db, aid, 1, number)
+
+    def test_unwatched(self):
+        query.status.cache_status(self.db, 1, force=True)
+        self.assertEqual((0, 0), self._status(1))
+
+    def test_complete(self):
+        self._watch(1, *range(1, 14))
+        query.status.cache_status(self.db, 1, force=True)
+        self.assertEqual((13, 1), self._status(1))
+
+    def test_gap(self):
+        self._watch(1, 1, 2, 4)
+        query.status.cache_status(self.db, 1, force=True)
+        self.assertEqual((2, 0), self._status(1))
+
+    def test_not_ended(self):
+        self._watch(3, *range(1, 5))
+        query.status.cache_status(self.db, 3, force=True)
+        self.assertEqual((4, 0), self._status(3))
+
+    def test_cached(self):
+        query.status.set_status(self.db, 1, False, 5)
+        query.status.cache_status(self.db, 1)
+        self.assertEqual((5, 0), self._status(1))
+        query.status.cache_status(self.db, 1, force=True)
+        self.assertEqual((0, 0), self._status(1))
+
+    def test_missing_anime(self):
+        with self.assertRaises(ValueError):
+            query.status.cache_status(self.db, 404)
+
+    def test_triggers(self):
+        self._watch(1, 1, 2, 4)
+        self.assertEqual((2, 0), self._status(1))
+        query.update.reset(self.db, 1, 13)
+        self.assertEqual((13, 1), self._status(1))
+        self.db.cursor().execute(
+            'UPDATE anime SET episodecount=14 WHERE aid=1')
+        self.assertEqual((13, 0), self._status(1))
+        self.db.cursor().execute(
+            'UPDATE episode SET user_watched=0 WHERE aid=1 AND number=5')
+        self.assertEqual((4, 0), self._status(1))
+        self.db.cursor().execute(
+            'DELETE FROM episode WHERE aid=1 AND number>=5')
+        self.assertEqual((4, 0), self._status(1))
+        self.assertEqual([], query.status.check_status(self.db))
+
+    def test_bump(self):
+        query.update.bump(self.db, 3)
+        query.update.bump(self.db, 3)
+        self.assertEqual((2, 0), self._status(3))
+
+    def test_check_status(self):
+        self.assertEqual([], query.status.check_status(self.db))
+        query.status.set_status(self.db, 2, False, 5)
+        self.db.cursor().execute('DELETE FROM cache_anime WHERE aid=3')
+        self.assertEqual([2, 3], query.status.check_status(self.db))
+
+    def test_create_triggers(self):
+        query.status.drop_triggers(self.db)
+        self._watch(2, 1, 2)
+        self.assertEqual((0, 0), self._status(2))
+        query.status.create_triggers(self.db)
+        self.assertEqual((2, 0), self._status(2))
+
+    def test_setup_after_teardown(self):
+        self._watch(2, 1)
+        manager = cachetable.make_manager(self.db)
+        manager.teardown()
+        manager.setup()
+        self.assertEqual((1, 0), self._status(2))
+        self.assertEqual([], query.status.check_status(self.db))
@@ -0,0 +1,121 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+from unittest import mock
+
+from animanager import anidb
+from animanager.db import query
+from tests.db import DatabaseTestCase
+from tests.test_localanidb import ANIDB_DATA
+
+
+def _read_anime(aid):
+    return (ANIDB_DATA / 'anime' / f'{aid}.xml').read_text()
+
+
+class AddTestCase(DatabaseTestCase):
+
+    def _episodes(self, aid):
+        cur = self.db.cursor()
+        cur.execute(
+            """SELECT type, number, title, user_watched FROM episode
+            WHERE aid=? ORDER BY type, number""",
+            (aid,))
+        return cur.fetchall()
+
+    def test_add(self):
+        query.update.add(self.db, anidb.parse_anime(_read_anime(1)))
+        episodes = self._episodes(1)
+        self.assertEqual(14, len(episodes))
+        self.assertEqual((1, 1, 'Episode 1 title', 0), episodes[0])
+
+    def test_add_stream(self):
+        text = _read_anime(2)
+        query.update.add(self.db, *anidb.parse_anime_stream(text))
+        self.assertEqual(26, len(self._episodes(2)))
+        self.assertEqual(
+            'Shingeki no Kyojin', query.select.lookup(self.db, 2).title)
+
+    def test_update(self):
+        anime = anidb.parse_anime(_read_anime(1))
+        query.update.add(self.db, anime)
+        query.update.reset(self.db, 1, 2)
+        episodes = anime.episodes
+        renamed = episodes[0]._replace(titles=(
+            episodes[0].titles[0]._replace(title='New title'),))
+        query.update.add(self.db, anime, (renamed,) + episodes[2:])
+        result = self._episodes(1)
+        self.assertEqual((1, 1, 'New title', 1), result[0])
+        self.assertEqual((1, 3), result[1][:2])
+        self.assertEqual(13, len(result))
+
+    def test_add_unchanged(self):
+        anime = anidb.parse_anime(_read_anime(1))
+        query.update.add(self.db, anime)
+        changes = self.db.totalchanges()
+        query.update.add(self.db, *anidb.parse_anime_stream(_read_anime(1)))
+        # Only the fetch time is updated.
+        self.assertEqual(changes + 1, self.db.totalchanges())
+
+    def test_add_changed(self):
+        anime = anidb.parse_anime(_read_anime(1))
+        query.update.add(self.db, anime)
+        query.update.add(self.db, anime._replace(episodecount=14))
+        self.assertEqual(14, query.select.lookup(self.db, 1).episodecount)
+
+    def test_add_many_episodes(self):
+        anime = anidb.parse_anime(_read_anime(1))
+        episode = anime.episodes[0]
+        episodes = [episode._replace(epno=str(number))
+                    for number in range(1, 1201)]
+        query.update.add(self.db, anime, episodes)
+        self.assertEqual(1200, len(self._episodes(1)))
+        query.update.add(self.db, anime, episodes[:100] + episodes[1100:])
+        self.assertEqual(200, len(self._episodes(1)))
+
+    def test_add_stream_iterates_twice(self):
+        anime, episodes = anidb.parse_anime_stream(_read_anime(2))
+        with mock.patch.object(
+                anidb.EpisodeStream, '__iter__', autospec=True,
+                side_effect=anidb.EpisodeStream.__iter__) as iter_:
+            query.update.add(self.db, anime, episodes)
+        # The episodes are streamed twice instead of kept in a list.
+        self.assertEqual(2, iter_.call_count)
+        self.assertEqual(26, len(self._episodes(2)))
+
+    def test_add_stream_digest(self):
+        anime, episodes = anidb.parse_anime_stream(_read_anime(2))
+        with mock.patch.object(
+                anidb.EpisodeStream, '__iter__', autospec=True,
+                side_effect=anidb.EpisodeStream.__iter__) as iter_:
+            query.update.add(self.db, anime, episodes, digest=episodes.digest)
+            # The episodes are only parsed again to write them.
+            self.assertEqual(1, iter_.call_count)
+            query.update.add(self.db, anime, episodes, digest=episodes.digest)
+            self.assertEqual(1, iter_.call_count)
+        self.assertEqual(26, len(self._episodes(2)))
+
+    def test_add_iterator(self):
+        anime = anidb.parse_anime(_read_anime(1))
+        query.update.add(self.db, anime, iter(anime.episodes))
+        self.assertEqual(14, len(self._episodes(1)))
+
+    def test_add_iterator_digest(self):
+        anime = anidb.parse_anime(_read_anime(1))
+        digest = anidb.episodes_digest(anime.episodes)
+        query.update.add(self.db, anime, iter(anime.episodes), digest=digest)
+        self.assertEqual(14, len(self._episodes(1)))
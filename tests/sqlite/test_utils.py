@@ -68,7 +68,8 @@ class MultipleKeyTestCase(unittest.TestCase):
         CREATE TABLE mytable (
             firstname TEXT,
             lastname TEXT,
-            age INTEGER
+            age INTEGER,
+            UNIQUE (firstname, lastname)
         )""")
         cur.execute("""
         INSERT INTO mytable (firstname, lastname, age)
@@ -96,3 +97,42 @@ class MultipleKeyTestCase(unittest.TestCase):
         cur = self.db.cursor()
         cur.execute('SELECT * FROM mytable')
         self.assertEqual(('Mir', 'Jakuri', 350), cur.fetchone())
+
+
+class UpsertManyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.db = Connection(':memory:')
+        self.db.cursor().execute("""
+        CREATE TABLE mytable (
+            id INTEGER PRIMARY KEY,
+            firstname TEXT,
+            lastname TEXT)""")
+
+    def test_upsert_many(self):
+        utils.upsert_many(self.db, 'mytable', ['id'], [
+            {'id': 1, 'firstname': 'Mir', 'lastname': 'Jakuri'},
+            {'id': 2, 'firstname': 'Ion', 'lastname': 'Preciel'},
+        ])
+        utils.upsert_many(self.db, 'mytable', ['id'], (
+            {'id': id_, 'lastname': 'Teiwaz'} for id_ in (2, 3)))
+        cur = self.db.cursor()
+        cur.execute('SELECT * FROM mytable ORDER BY id')
+        self.assertEqual([
+            (1, 'Mir', 'Jakuri'),
+            (2, 'Ion', 'Teiwaz'),
+            (3, None, 'Teiwaz'),
+        ], cur.fetchall())
+
+    def test_upsert_many_empty(self):
+        utils.upsert_many(self.db, 'mytable', ['id'], [])
+        cur = self.db.cursor()
+        cur.execute('SELECT * FROM mytable')
+        self.assertEqual([], cur.fetchall())
+
+    def test_upsert_keys_only(self):
+        utils.upsert(self.db, 'mytable', ['id'], {'id': 1})
+        utils.upsert(self.db, 'mytable', ['id'], {'id': 1})
+        cur = self.db.cursor()
+        cur.execute('SELECT * FROM mytable')
+        self.assertEqual([(1, None, None)], cur.fetchall())
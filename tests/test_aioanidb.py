@@ -0,0 +1,138 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+from mir.anidb import api
+
+from animanager import anidb
+from animanager.aioanidb import AsyncAniDB, run
+from animanager.fetch import TokenBucket
+from tests.test_localanidb import ANIDB_DATA, LocalAniDBMixin
+
+
+async def _collect(aiter):
+    return [x async for x in aiter]
+
+
+class AsyncAniDBTestCase(LocalAniDBMixin, unittest.TestCase):
+
+    def test_request_anime(self):
+        self.start_local_anidb()
+
+        async def request():
+            async with AsyncAniDB() as client:
+                return await client.request_anime(1)
+        anime = run(request())
+        self.assertIsInstance(anime, anidb.Anime)
+        self.assertIsInstance(anime.episodes[0], anidb.Episode)
+        self.assertEqual('Mahou Shoujo Madoka Magica', anime.title)
+
+    def test_request_anime_many(self):
+        server = self.start_local_anidb(min_interval=0.025)
+
+        async def request():
+            async with AsyncAniDB(TokenBucket(20), workers=2) as client:
+                return await _collect(client.request_anime_many([3, 1, 2]))
+        anime = run(request())
+        self.assertEqual([3, 1, 2], [x.aid for x in anime])
+        self.assertEqual(0, server.banned_count)
+
+    def test_connection_reuse(self):
+        server = self.start_local_anidb()
+
+        async def request():
+            async with AsyncAniDB() as client:
+                for aid in (1, 2, 3):
+                    await client.request_anime(aid)
+        run(request())
+        self.assertEqual(1, server.connection_count)
+
+    def test_timeout(self):
+        self.start_local_anidb(latency=0.5)
+
+        async def request():
+            async with AsyncAniDB(timeout=0.05) as client:
+                await client.request_anime(1)
+        with self.assertRaises(asyncio.TimeoutError):
+            run(request())
+
+    def test_error_cancels(self):
+        self.start_local_anidb()
+
+        async def request():
+            async with AsyncAniDB() as client:
+                return await _collect(client.request_anime_many([1, 404, 2]))
+        with self.assertRaises(anidb.RequestError) as cm:
+            run(request())
+        self.assertEqual(404, cm.exception.aid)
+        self.assertIsInstance(cm.exception.__cause__, api.APIError)
+
+    def test_error_keeps_limiter(self):
+        self.start_local_anidb()
+        limiter = TokenBucket(100)
+
+        async def request():
+            async with AsyncAniDB(limiter, workers=2) as client:
+                return await _collect(
+                    client.request_anime_many([404] + [1] * 50))
+        with self.assertRaises(anidb.RequestError):
+            run(request())
+        # Only the requests that were started used tokens.
+        self.assertGreater(limiter._tokens, -3)
+
+
+class StreamTestCase(LocalAniDBMixin, unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        directory = os.path.join(tmpdir.name, 'anidb')
+        shutil.copytree(ANIDB_DATA, directory)
+        self.text = (ANIDB_DATA / 'anime' / '1.xml').read_text()
+        with open(os.path.join(directory, 'anime', '5.xml'), 'w') as file:
+            file.write(self.text[:-200])
+        self.start_local_anidb(directory)
+        self.cache = anidb.AnimeCache(
+            os.path.join(tmpdir.name, 'cache'),
+            datetime.timedelta(days=1), 2**20)
+
+    def _request(self, aids):
+        async def request():
+            async with AsyncAniDB() as client:
+                return await _collect(client.request_anime_many(
+                    aids, self.cache, parse=anidb.parse_anime_stream))
+        return run(request())
+
+    def test_truncated_not_cached(self):
+        with self.assertRaises(anidb.RequestError) as cm:
+            self._request([5])
+        self.assertEqual(5, cm.exception.aid)
+        self.assertIsInstance(cm.exception.__cause__, ET.ParseError)
+        self.assertIsNone(self.cache.get(5))
+
+    def test_bad_cache_ignored(self):
+        self.cache.put(1, self.text[:-200])
+        (anime, episodes), = self._request([1])
+        self.assertEqual(14, len(list(episodes)))
+        self.assertEqual(self.text, self.cache.get(1))
@@ -0,0 +1,348 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+import datetime
+import gzip
+import os
+import pickle
+import re
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import xml.etree.ElementTree as ET
+
+from mir.anidb import api
+from mir.anidb.anime import AnimeTitle
+from mir.anidb.titles import Titles
+
+from animanager import anidb
+from animanager.anidb import AnimeCache, Prefetcher, TitleSearcher, read_titles
+from animanager.fetch import TokenBucket
+from tests.test_localanidb import ANIDB_DATA, LocalAniDBMixin
+
+TITLES_LIST = [
+    Titles(aid=11, titles=(
+        AnimeTitle(title='Mahou Shoujo Madoka Magica', type='main', lang='x-jat'),
+        AnimeTitle(title='Puella Magi Madoka Magica', type='official', lang='en'),
+    )),
+    Titles(aid=5, titles=(
+        AnimeTitle(title='Shingeki no Kyojin', type='main', lang='x-jat'),
+        AnimeTitle(title='Attack on Titan', type='official', lang='en'),
+    )),
+]
+
+TITLES_XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<animetitles>
+<anime aid="11">
+<title xml:lang="x-jat" type="main">Mahou Shoujo Madoka Magica</title>
+<title xml:lang="en" type="official">Puella Magi Madoka Magica</title>
+</anime>
+<anime aid="7">
+<title xml:lang="x-jat" type="main">Kanon</title>
+</anime>
+</animetitles>
+"""
+
+
+class TitleSearcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cachedir = self._make_cachedir('cache')
+
+    def _make_cachedir(self, name):
+        cachedir = os.path.join(self.tmpdir.name, name)
+        os.mkdir(cachedir)
+        with open(os.path.join(cachedir, 'anime-titles.pickle'), 'wb') as file:
+            pickle.dump(TITLES_LIST, file)
+        return cachedir
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _search(self, searcher, pattern):
+        query = re.compile(pattern, re.I)
+        return [(x.aid, x.main_title) for x in searcher.search(query)]
+
+    def test_stores(self):
+        for store in ('pickle', 'fts5', 'mmap'):
+            with self.subTest(store=store):
+                searcher = TitleSearcher(self.cachedir, store)
+                self.assertEqual([(5, 'Shingeki no Kyojin')],
+                                 self._search(searcher, 'attack'))
+
+    def test_search_once_per_anime(self):
+        searcher = TitleSearcher(self.cachedir)
+        results = list(searcher.search(re.compile('madoka', re.I)))
+        self.assertEqual([11], [x.aid for x in results])
+        self.assertEqual(
+            ['Mahou Shoujo Madoka Magica', 'Puella Magi Madoka Magica'],
+            results[0].titles)
+
+    def test_search_cache(self):
+        searcher = TitleSearcher(self.cachedir)
+        query = re.compile('madoka|kyojin', re.I)
+        expected = list(searcher.search(query))
+        with mock.patch.object(searcher, '_search') as search:
+            self.assertEqual(expected, list(searcher.search(query)))
+        search.assert_not_called()
+        self.assertEqual((1, 1), searcher.search_cache.info()[:2])
+
+    def test_search_cache_partial(self):
+        searcher = TitleSearcher(self.cachedir)
+        query = re.compile('madoka|kyojin', re.I)
+        first = next(searcher.search(query))
+        self.assertEqual(1, len(searcher.search_cache))
+        with mock.patch.object(searcher, '_search') as search:
+            results = list(searcher.search(query))
+        search.assert_not_called()
+        self.assertEqual(first, results[0])
+        self.assertEqual([5, 11], sorted(x.aid for x in results))
+
+    def test_search_cache_error(self):
+        searcher = TitleSearcher(self.cachedir)
+        query = re.compile('madoka|kyojin', re.I)
+        expected = list(searcher.search(query))
+        searcher.search_cache.clear()
+        with mock.patch.object(searcher._store, 'candidates',
+                               side_effect=OSError):
+            with self.assertRaises(OSError):
+                list(searcher.search(query))
+        self.assertEqual(0, len(searcher.search_cache))
+        self.assertEqual(expected, list(searcher.search(query)))
+
+    def test_search_normalized(self):
+        searcher = TitleSearcher(self.cachedir)
+        results = list(searcher.search_normalized('ＭＡＤＯＫＡ—magica'))
+        self.assertEqual([11], [x.aid for x in results])
+        self.assertEqual([], list(searcher.search_normalized('magica madoka')))
+
+    def test_preload(self):
+        searcher = TitleSearcher(self.cachedir)
+        searcher.preload()
+        self.assertEqual([(5, 'Shingeki no Kyojin')],
+                         self._search(searcher, 'kyojin'))
+
+    def test_preload_failure(self):
+        searcher = TitleSearcher(self.cachedir, 'mmap')
+        with mock.patch.object(searcher._store, 'replace',
+                               side_effect=[OSError, None]) as replace:
+            searcher.preload()
+            list(searcher.search(re.compile('kyojin')))
+        self.assertEqual(2, replace.call_count)
+
+    def _write_dump(self, name, data):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'wb') as file:
+            file.write(data)
+        return path
+
+    def test_read_titles(self):
+        path = self._write_dump('titles.xml.gz', gzip.compress(TITLES_XML))
+        self.assertEqual(TITLES_LIST[:1], read_titles(path)[:1])
+        self.assertEqual([11, 7], [x.aid for x in read_titles(path)])
+
+    def test_refresh(self):
+        path = self._write_dump('titles.xml', TITLES_XML)
+        for store in ('pickle', 'fts5', 'mmap'):
+            with self.subTest(store=store):
+                searcher = TitleSearcher(self._make_cachedir(store), store)
+                self.assertEqual([(5, 'Shingeki no Kyojin')],
+                                 self._search(searcher, 'kyojin'))
+                diff = searcher.refresh(path=path)
+                self.assertEqual([7], [x.aid for x in diff.added])
+                self.assertEqual([], diff.changed)
+                self.assertEqual([5], diff.removed)
+                self.assertEqual([], self._search(searcher, 'kyojin'))
+                self.assertEqual([(7, 'Kanon')],
+                                 self._search(searcher, 'kanon'))
+                self.assertEqual([(11, 'Mahou Shoujo Madoka Magica')],
+                                 self._search(searcher, 'mahou'))
+
+    def test_refresh_changed(self):
+        path = self._write_dump('titles.xml', TITLES_XML.replace(
+            b'Puella Magi', b'Puella Magi Kyojin'))
+        searcher = TitleSearcher(self.cachedir, 'fts5')
+        diff = searcher.refresh(path=path)
+        self.assertEqual([11], [x.aid for x in diff.changed])
+        self.assertEqual([(11, 'Mahou Shoujo Madoka Magica')],
+                         self._search(searcher, 'kyojin'))
+
+    def test_refresh_without_cache(self):
+        path = self._write_dump('titles.xml', TITLES_XML)
+        for store in ('fts5', 'mmap'):
+            with self.subTest(store=store):
+                cachedir = self._make_cachedir(store)
+                TitleSearcher(cachedir, store).refresh(path=path)
+                os.unlink(os.path.join(cachedir, 'anime-titles.pickle'))
+                searcher = TitleSearcher(cachedir, store)
+                searcher.refresh(path=path)
+                self.assertEqual([(11, 'Mahou Shoujo Madoka Magica')],
+                                 self._search(searcher, 'madoka'))
+
+    def test_stale_store(self):
+        searcher = TitleSearcher(self.cachedir, 'fts5')
+        self._search(searcher, 'kyojin')
+        store_path = os.path.join(self.cachedir, 'anime-titles.sqlite')
+        os.utime(store_path, (0, 0))
+        # Titles were refreshed while another store was in use.
+        path = self._write_dump('titles.xml', TITLES_XML)
+        TitleSearcher(self.cachedir).refresh(path=path)
+        os.utime(store_path, (0, 0))
+        searcher = TitleSearcher(self.cachedir, 'fts5')
+        self.assertEqual([], self._search(searcher, 'kyojin'))
+        self.assertEqual([(7, 'Kanon')], self._search(searcher, 'kanon'))
+
+    def test_refresh_ttl(self):
+        path = self._write_dump('titles.xml', TITLES_XML)
+        searcher = TitleSearcher(self.cachedir)
+        self.assertIsNone(
+            searcher.refresh(ttl=datetime.timedelta(days=1), path=path))
+        self.assertIsNotNone(
+            searcher.refresh(ttl=datetime.timedelta(0), path=path))
+
+
+ANIME_XML = (ANIDB_DATA / 'anime' / '1.xml').read_text()
+
+
+class ParseAnimeStreamTestCase(unittest.TestCase):
+
+    def test_same_as_parse_anime(self):
+        anime, episodes = anidb.parse_anime_stream(ANIME_XML)
+        expected = anidb.parse_anime(ANIME_XML)
+        self.assertEqual(expected._replace(episodes=()), anime)
+        self.assertEqual(list(expected.episodes), list(episodes))
+
+    def test_error(self):
+        with self.assertRaises(api.APIError):
+            anidb.parse_anime_stream('<error>Banned</error>')
+
+    def test_truncated(self):
+        with self.assertRaises(ET.ParseError):
+            anidb.parse_anime_stream(ANIME_XML[:-200])
+
+    def test_digest(self):
+        _, episodes = anidb.parse_anime_stream(ANIME_XML)
+        expected = anidb.parse_anime(ANIME_XML).episodes
+        self.assertEqual(anidb.episodes_digest(expected), episodes.digest)
+
+    def test_iterate_twice(self):
+        _, episodes = anidb.parse_anime_stream(ANIME_XML)
+        self.assertEqual(14, len(list(episodes)))
+        self.assertEqual(list(episodes), list(episodes))
+
+
+class AnimeCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.cache = AnimeCache(
+            os.path.join(self.tmpdir.name, 'anime'),
+            datetime.timedelta(days=1), 2**20)
+
+    def test_get(self):
+        self.assertIsNone(self.cache.get(1))
+        self.cache.put(1, ANIME_XML)
+        self.assertEqual(ANIME_XML, self.cache.get(1))
+
+    def test_ttl(self):
+        self.cache.put(1, ANIME_XML)
+        path = os.path.join(self.tmpdir.name, 'anime', '1.xml.gz')
+        os.utime(path, (0, 0))
+        self.assertIsNone(self.cache.get(1))
+
+    def test_evict(self):
+        self.cache.put(1, ANIME_XML)
+        size = os.path.getsize(
+            os.path.join(self.tmpdir.name, 'anime', '1.xml.gz'))
+        cache = AnimeCache(
+            os.path.join(self.tmpdir.name, 'anime'),
+            datetime.timedelta(days=1), size * 2)
+        os.utime(os.path.join(self.tmpdir.name, 'anime', '1.xml.gz'), (1, 1))
+        cache.put(2, ANIME_XML)
+        cache.put(3, ANIME_XML)
+        self.assertIsNone(cache.get(1))
+        self.assertIsNotNone(cache.get(2))
+        self.assertIsNotNone(cache.get(3))
+
+    def test_request_anime_many(self):
+        self.cache.put(1, ANIME_XML)
+        with mock.patch.object(anidb, 'request_anime_xml',
+                               return_value=(ANIDB_DATA / 'anime' / '2.xml').read_text()) as request:
+            anime = list(anidb.request_anime_many(
+                [1, 2], None, cache=self.cache))
+        self.assertEqual([1, 2], [x.aid for x in anime])
+        request.assert_called_once_with(2)
+        self.assertIsNotNone(self.cache.get(2))
+
+    def test_request_anime_refresh(self):
+        self.cache.put(1, ANIME_XML)
+        with mock.patch.object(anidb, 'request_anime_xml',
+                               return_value=ANIME_XML) as request:
+            anidb.request_anime(1, self.cache, refresh=True)
+        request.assert_called_once_with(1)
+
+
+class PrefetcherTestCase(LocalAniDBMixin, unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.cache = AnimeCache(
+            os.path.join(tmpdir.name, 'anime'),
+            datetime.timedelta(days=1), 2**20)
+
+    def test_prefetch(self):
+        server = self.start_local_anidb(min_interval=0.05)
+        prefetcher = Prefetcher(self.cache, TokenBucket(10))
+        prefetcher.prefetch([404, 1, 2])
+        self.assertTrue(prefetcher.wait(5))
+        self.assertIsNotNone(self.cache.get(1))
+        self.assertIsNotNone(self.cache.get(2))
+        self.assertEqual(0, server.banned_count)
+
+    def test_prefetch_cached(self):
+        server = self.start_local_anidb()
+        self.cache.put(1, ANIME_XML)
+        prefetcher = Prefetcher(self.cache, None)
+        prefetcher.prefetch([1])
+        self.assertTrue(prefetcher.wait(5))
+        self.assertEqual(0, server.request_count)
+
+    def test_wait_for(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def request(aids, limiter, cache):
+            started.set()
+            release.wait(5)
+            return []
+
+        prefetcher = Prefetcher(self.cache, None)
+        with mock.patch.object(anidb, 'request_anime_many',
+                               side_effect=request) as request_many:
+            prefetcher.prefetch([1, 2])
+            self.assertTrue(started.wait(5))
+            # 1 is being requested, 2 is not requested yet.
+            self.assertFalse(prefetcher.wait_for([1], 0.05))
+            self.assertTrue(prefetcher.wait_for([2], 0))
+            release.set()
+            self.assertTrue(prefetcher.wait_for([1], 5))
+            self.assertTrue(prefetcher.wait(5))
+        request_many.assert_called_once_with([1], None, cache=self.cache)
@@ -0,0 +1,108 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import unittest
+
+from animanager import anidb
+from animanager.aioanidb import run
+from animanager.fetch import TokenBucket, fetch_all
+from tests.test_localanidb import LocalAniDBMixin
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TokenBucketTestCase(unittest.TestCase):
+
+    def test_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(0.5, clock=clock, sleep=clock.sleep)
+        starts = []
+        for _ in range(3):
+            bucket.acquire()
+            starts.append(clock.now)
+        self.assertEqual([0, 2, 4], starts)
+
+    def test_refill(self):
+        clock = FakeClock()
+        bucket = TokenBucket(0.5, capacity=2, clock=clock, sleep=clock.sleep)
+        bucket.acquire()
+        bucket.acquire()
+        clock.now = 10
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(10, clock.now)
+        bucket.acquire()
+        self.assertEqual(12, clock.now)
+
+    def test_cancel_gives_back_token(self):
+        bucket = TokenBucket(0.5)
+
+        async def acquire():
+            await bucket.acquire_async()
+            await bucket.acquire_async()
+        with self.assertRaises(asyncio.TimeoutError):
+            run(asyncio.wait_for(acquire(), 0.01))
+        self.assertGreater(bucket._tokens, -0.1)
+
+
+class FetchAllTestCase(unittest.TestCase):
+
+    def test_order(self):
+        bucket = TokenBucket(1000)
+        results = list(fetch_all(lambda x: x * 2, range(10), bucket, 3))
+        self.assertEqual([(x, x * 2) for x in range(10)], results)
+
+    def test_error(self):
+        def fetch(key):
+            if key == 1:
+                raise ValueError(key)
+            return key
+        results = fetch_all(fetch, range(3), TokenBucket(1000))
+        self.assertEqual((0, 0), next(results))
+        with self.assertRaises(ValueError):
+            next(results)
+
+
+class RequestAnimeTestCase(LocalAniDBMixin, unittest.TestCase):
+
+    def test_fetch_all(self):
+        self.start_local_anidb()
+        results = fetch_all(
+            anidb.request_anime_xml, [3, 1, 2], TokenBucket(1000), 2)
+        anime = [anidb.parse_anime(text) for _, text in results]
+        self.assertEqual([3, 1, 2], [x.aid for x in anime])
+        self.assertEqual('Ongoing Anime', anime[0].title)
+        self.assertEqual(1, anime[0].episodes[0].number)
+
+    def test_rate_limit(self):
+        server = self.start_local_anidb(min_interval=0.025)
+        results = fetch_all(
+            anidb.request_anime_xml, [1, 2, 3, 1], TokenBucket(20), 2)
+        anime = [anidb.parse_anime(text) for _, text in results]
+        self.assertEqual(4, len(anime))
+        self.assertEqual(0, server.banned_count)
@@ -0,0 +1,88 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+from pathlib import Path
+import tempfile
+import time
+import unittest
+
+from mir.anidb import api
+
+from animanager import anidb
+from animanager.fetch import TokenBucket
+from animanager.localanidb import LocalAniDB, record
+
+# Recorded responses served by LocalAniDB.
+ANIDB_DATA = Path(__file__).parent / 'data' / 'anidb'
+
+
+class LocalAniDBMixin:
+
+    """Mixin for test cases that make AniDB requests to LocalAniDB."""
+
+    def start_local_anidb(self, directory=ANIDB_DATA, **kwargs) -> LocalAniDB:
+        server = LocalAniDB(directory, **kwargs)
+        server.start()
+        self.addCleanup(server.stop)
+        old_client = anidb.set_client(server.client)
+        self.addCleanup(anidb.set_client, old_client)
+        return server
+
+
+class LocalAniDBTestCase(LocalAniDBMixin, unittest.TestCase):
+
+    def test_request_anime(self):
+        self.start_local_anidb()
+        anime = anidb.request_anime(2)
+        self.assertEqual('Shingeki no Kyojin', anime.title)
+        self.assertEqual(26, len(anime.episodes))
+
+    def test_anime_not_found(self):
+        self.start_local_anidb()
+        with self.assertRaises(api.APIError):
+            anidb.request_anime(404)
+
+    def test_request_titles(self):
+        self.start_local_anidb()
+        titles = anidb.request_titles()
+        self.assertEqual([1, 2, 3], [x.aid for x in titles])
+
+    def test_banned(self):
+        server = self.start_local_anidb(min_interval=60)
+        anidb.request_anime(1)
+        with self.assertRaises(api.APIError):
+            anidb.request_anime(1)
+        self.assertEqual((2, 1), (server.request_count, server.banned_count))
+
+    def test_latency(self):
+        self.start_local_anidb(latency=0.1)
+        start = time.monotonic()
+        anidb.request_anime(1)
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+    def test_record(self):
+        self.start_local_anidb()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            record(tmpdir, [1, 3], TokenBucket(1000), titles=True)
+            recorded = Path(tmpdir)
+            self.assertEqual(
+                (ANIDB_DATA / 'anime' / '3.xml').read_text(),
+                (recorded / 'anime' / '3.xml').read_text())
+            self.assertFalse((recorded / 'anime' / '2.xml').exists())
+            self.start_local_anidb(recorded)
+            self.assertEqual(3, anidb.request_anime(3).aid)
+            self.assertEqual(3, len(anidb.request_titles()))
@@ -57,3 +57,46 @@ class ParseAIDTestCase(unittest.TestCase):
     def test_invalid_number(self):
         with self.assertRaises(ResultNumberError):
             self.manager.parse_aid('foo:5', 'foo')
+
+
+class ParseAIDsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = AIDResultsManager({
+            'foo': AIDResults(
+                ['Title'],
+                [(1, 'Madoka'), (2, 'Madoka'), (3, 'Madoka')],
+            ),
+            'bar': AIDResults(
+                ['Title'],
+                [(4, 'Madoka'), (5, 'Madoka'), (6, 'Madoka')],
+            ),
+        })
+
+    def test_explicit_aids(self):
+        self.assertEqual(
+            self.manager.parse_aids('aid:12345,23456', 'foo'), [12345, 23456])
+
+    def test_range(self):
+        self.assertEqual(self.manager.parse_aids('1-2,3', 'bar'), [4, 5, 6])
+
+    def test_explicit_key(self):
+        self.assertEqual(self.manager.parse_aids('bar:3,1', 'foo'), [6, 4])
+
+    def test_last_aid(self):
+        self.manager.parse_aids('1-3', 'foo')
+        self.assertEqual(self.manager.parse_aids('.', 'bar'), [3])
+
+    def test_invalid_range(self):
+        with self.assertRaises(InvalidSyntaxError):
+            self.manager.parse_aids('1-a', 'foo')
+
+    def test_reversed_range(self):
+        with self.assertRaises(InvalidSyntaxError):
+            self.manager.parse_aids('3-1', 'foo')
+        with self.assertRaises(InvalidSyntaxError):
+            self.manager.parse_aids('bar:2,3-1', 'foo')
+
+    def test_invalid_number(self):
+        with self.assertRaises(ResultNumberError):
+            self.manager.parse_aids('2-4', 'foo')
@@ -0,0 +1,110 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import re
+import tempfile
+import unittest
+from unittest import mock
+
+from mir.anidb.anime import AnimeTitle
+from mir.anidb.titles import Titles
+
+from animanager.titles import MmapTitleStore
+from animanager.titles import compact
+
+TITLES_LIST = [
+    Titles(aid=11, titles=(
+        AnimeTitle(title='Mahou Shoujo Madoka Magica', type='main', lang='x-jat'),
+        AnimeTitle(title='魔法少女まどか☆マギカ', type='official', lang='ja'),
+    )),
+    Titles(aid=5, titles=(
+        AnimeTitle(title='Shingeki no Kyojin', type='main', lang='x-jat'),
+        AnimeTitle(title='Attack on Titan', type='official', lang='en'),
+    )),
+    Titles(aid=7, titles=(
+        AnimeTitle(title='Kanon (2006)', type='main', lang='x-jat'),
+    )),
+]
+
+
+class MmapTitleStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'anime-titles.bin')
+        self.store = MmapTitleStore(self.path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _aids(self, pattern):
+        query = re.compile(pattern, re.I)
+        return [titles.aid for titles in self.store.candidates(query)]
+
+    def test_is_empty(self):
+        self.assertTrue(self.store.is_empty())
+        self.store.replace(TITLES_LIST)
+        self.assertFalse(self.store.is_empty())
+
+    def test_roundtrip(self):
+        self.store.replace(TITLES_LIST)
+        got = list(MmapTitleStore(self.path).candidates(re.compile('')))
+        self.assertEqual(TITLES_LIST, got)
+
+    def test_search(self):
+        self.store.replace(TITLES_LIST)
+        self.assertEqual([11], self._aids('madoka.*magica'))
+        self.assertEqual([11], self._aids('まどか'))
+        self.assertEqual([11, 5, 7], self._aids('o'))
+        self.assertEqual([5, 7], self._aids('[nk]o'))
+        self.assertEqual([7], self._aids(r'kanon \('))
+        self.assertEqual([], self._aids('nonexistent'))
+
+    def test_replace(self):
+        self.store.replace(TITLES_LIST)
+        self.store.replace(TITLES_LIST[2:])
+        self.assertEqual([7], self._aids('o'))
+
+    def test_invalid_file(self):
+        with open(self.path, 'wb') as file:
+            file.write(b'garbage')
+        self.assertTrue(MmapTitleStore(self.path).is_empty())
+
+    @mock.patch.object(compact, '_MIN_PARALLEL_ENTRIES', 0)
+    def test_parallel_scan(self):
+        self.store.replace(TITLES_LIST)
+        store = MmapTitleStore(self.path, workers=2)
+        query = re.compile('^[a-z]+ [^ ]+ [^ ]+$', re.I)
+        self.assertEqual(list(self.store.candidates(query)),
+                         list(store.candidates(query)))
+        self.assertEqual(
+            [11, 5, 7],
+            [x.aid for x in store.candidates(re.compile('[かn]'))])
+
+    @mock.patch.object(compact, '_MIN_PARALLEL_ENTRIES', 0)
+    def test_replace_shuts_down_workers(self):
+        self.store.replace(TITLES_LIST)
+        store = MmapTitleStore(self.path, workers=2)
+        self.addCleanup(store.close)
+        query = re.compile('[かn]')
+        list(store.candidates(query))
+        executor = store._executor
+        store.replace(TITLES_LIST[2:])
+        with self.assertRaises(RuntimeError):
+            executor.submit(int)
+        self.assertEqual([7], [x.aid for x in store.candidates(query)])
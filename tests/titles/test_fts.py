@@ -0,0 +1,77 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+import unittest
+
+from mir.anidb.anime import AnimeTitle
+from mir.anidb.titles import Titles
+
+from animanager.titles import FTSTitleStore
+
+TITLES_LIST = [
+    Titles(aid=11, titles=(
+        AnimeTitle(title='Mahou Shoujo Madoka Magica', type='main', lang='x-jat'),
+        AnimeTitle(title='魔法少女まどか☆マギカ', type='official', lang='ja'),
+    )),
+    Titles(aid=5, titles=(
+        AnimeTitle(title='Shingeki no Kyojin', type='main', lang='x-jat'),
+        AnimeTitle(title='Attack on Titan', type='official', lang='en'),
+    )),
+    Titles(aid=7, titles=(
+        AnimeTitle(title='Kanon (2006)', type='main', lang='x-jat'),
+    )),
+]
+
+
+class FTSTitleStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.store = FTSTitleStore(':memory:')
+
+    def _aids(self, pattern):
+        query = re.compile(pattern, re.I)
+        return [titles.aid for titles in self.store.candidates(query)
+                if any(query.search(t.title) for t in titles.titles)]
+
+    def test_is_empty(self):
+        self.assertTrue(self.store.is_empty())
+        self.store.replace(TITLES_LIST)
+        self.assertFalse(self.store.is_empty())
+
+    def test_candidates_roundtrip(self):
+        self.store.replace(TITLES_LIST)
+        got = list(self.store.candidates(re.compile('.')))
+        self.assertEqual(TITLES_LIST, got)
+
+    def test_candidates_match(self):
+        self.store.replace(TITLES_LIST)
+        query = re.compile('ATTACK', re.I)
+        self.assertEqual([TITLES_LIST[1]], list(self.store.candidates(query)))
+
+    def test_search(self):
+        self.store.replace(TITLES_LIST)
+        self.assertEqual([11], self._aids('madoka.*magica'))
+        self.assertEqual([11], self._aids('まどか'))
+        self.assertEqual([11, 5, 7], self._aids('o'))
+        self.assertEqual([7], self._aids(r'kanon \('))
+        self.assertEqual([], self._aids('nonexistent'))
+
+    def test_replace(self):
+        self.store.replace(TITLES_LIST)
+        self.store.replace(TITLES_LIST[2:])
+        self.assertEqual([7], self._aids('n'))
@@ -0,0 +1,63 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from mir.anidb.anime import AnimeTitle
+from mir.anidb.titles import Titles
+
+from animanager.titles import NormalizedTitleIndex
+
+
+def _titles(aid, *titles):
+    return Titles(aid=aid, titles=tuple(
+        AnimeTitle(title=title, type='main', lang='x-jat')
+        for title in titles))
+
+
+class NormalizedTitleIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = NormalizedTitleIndex([
+            _titles(1, 'Shōjo Shūmatsu Ryokō'),
+            _titles(2, 'K-On!!', 'けいおん!!'),
+            _titles(3, 'Kidō Senshi Gundam', '機動戦士ガンダム'),
+        ])
+
+    def _search(self, text):
+        return [x.aid for x in self.index.search(text)]
+
+    def test_accents(self):
+        self.assertEqual([1], self._search('shojo ryoko'))
+
+    def test_punctuation(self):
+        self.assertEqual([2], self._search('k on'))
+        self.assertEqual([2], self._search('K.ON'))
+
+    def test_width(self):
+        self.assertEqual([2], self._search('けいおん！！'))
+        self.assertEqual([3], self._search('ＧＵＮＤＡＭ'))
+
+    def test_voicing_marks_kept(self):
+        self.assertEqual([3], self._search('ガンダム'))
+        self.assertEqual([], self._search('カンタム'))
+
+    def test_word_order(self):
+        self.assertEqual([], self._search('ryoko shojo'))
+
+    def test_empty(self):
+        self.assertEqual([1, 2, 3], self._search(''))
@@ -0,0 +1,58 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import namedtuple
+import itertools
+import unittest
+
+from animanager.titles import rank
+
+WorkTitles = namedtuple('WorkTitles', 'aid,main_title,titles')
+
+RESULTS = [
+    WorkTitles(1, 'Shingeki no Kyojin', ['Shingeki no Kyojin', 'Attack on Titan']),
+    WorkTitles(2, 'Shingeki no Kyojin Season 2', ['Shingeki no Kyojin Season 2']),
+    WorkTitles(3, 'Shingeki no Kyojin OVA', ['Shingeki no Kyojin OVA']),
+    WorkTitles(4, 'Shingeki! Kyojin Chuugakkou', ['Shingeki! Kyojin Chuugakkou']),
+]
+
+
+class RankTestCase(unittest.TestCase):
+
+    def _aids(self, results, text, limit):
+        return [result.aid for result in rank(results, text, limit)]
+
+    def test_order(self):
+        self.assertEqual(
+            [1, 3, 2, 4], self._aids(RESULTS, 'shingeki no kyojin', 10))
+
+    def test_limit(self):
+        self.assertEqual([1, 3], self._aids(RESULTS, 'shingeki no kyojin', 2))
+
+    def test_main_title_preferred(self):
+        results = [
+            WorkTitles(1, 'Kanon', ['Foo', 'Kanon']),
+            WorkTitles(2, 'Bar', ['Bar', 'Kanon']),
+        ]
+        self.assertEqual([1, 2], self._aids(reversed(results), 'kanon', 2))
+
+    def test_early_termination(self):
+        results = itertools.chain(
+            [WorkTitles(1, 'Kanon', ['Kanon'])],
+            iter(lambda: self.fail('Consumed too many results'), None),
+        )
+        self.assertEqual([1], self._aids(results, 'kanon', 1))
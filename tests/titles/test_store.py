@@ -0,0 +1,68 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+import unittest
+
+from mir.anidb.anime import AnimeTitle
+from mir.anidb.titles import Titles
+
+from animanager.titles import MemoryTitleStore, diff_titles
+
+
+def _titles(aid, title):
+    return Titles(aid=aid, titles=(
+        AnimeTitle(title=title, type='main', lang='x-jat'),
+    ))
+
+
+TITLES_LIST = [_titles(aid, f'Madoka {aid}') for aid in range(1, 11)]
+
+
+class MemoryTitleStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.store = MemoryTitleStore()
+        self.store.replace(TITLES_LIST)
+
+    def _update(self, new):
+        self.store.update(diff_titles(TITLES_LIST, new), new)
+
+    def _aids(self, pattern):
+        query = re.compile(pattern, re.I)
+        return [titles.aid for titles in self.store.candidates(query)
+                if any(query.search(t.title) for t in titles.titles)]
+
+    def test_update_in_place(self):
+        new = list(TITLES_LIST)
+        new[2] = _titles(3, 'Kanon')
+        self._update(new)
+        self.assertEqual(new, list(self.store.candidates(re.compile(''))))
+        self.assertEqual([3], self._aids('kanon'))
+        self.assertNotIn(3, self._aids('madoka'))
+
+    def test_update_compacts(self):
+        new = TITLES_LIST[:2] + TITLES_LIST[5:] + [_titles(11, 'Kanon')]
+        self._update(new)
+        self.assertEqual(len(new), len(self.store._titles_list))
+        self.assertEqual(new, list(self.store.candidates(re.compile(''))))
+
+    def test_update_few_removed(self):
+        new = TITLES_LIST[1:]
+        self._update(new)
+        self.assertEqual(new, list(self.store.candidates(re.compile(''))))
+        self.assertEqual(list(range(2, 11)), self._aids('madoka'))
@@ -0,0 +1,86 @@
+# Copyright (C) 2018  Allen Li
+#
+# This file is part of Animanager.
+#
+# Animanager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Animanager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Animanager.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+import unittest
+
+from animanager.titles import TrigramIndex
+
+ENTRIES = [
+    ['Mahou Shoujo Madoka Magica', '魔法少女まどか☆マギカ'],
+    ['Shingeki no Kyojin', 'Attack on Titan'],
+    ['KANON', 'Kanon (2006)'],
+    ['Dıgımon', 'Digimon Adventure'],
+    ['Kimi no Na wa.', 'Your Name.'],
+    ['Shoujo Shūmatsu Ryokou', 'Girls\' Last Tour'],
+    ['Pokémon', 'Poketto Monsutā'],
+    ['Working!!', 'WORKING!!'],
+]
+
+QUERIES = [
+    'madoka.*magica',
+    'まどか',
+    'shingeki',
+    'kanon \\(',
+    'digi',
+    'dıg',
+    'na wa\\.',
+    'shūmatsu',
+    'pokémon',
+    'on',
+    'k.*n',
+    'working|kanon',
+    '[kp]o',
+    'ki(mi no)? na',
+    'tt?ack',
+]
+
+
+class TrigramIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.index = TrigramIndex(ENTRIES)
+
+    def _scan(self, query):
+        return [i for i, titles in enumerate(ENTRIES)
+                if any(query.search(title) for title in titles)]
+
+    def _search(self, query):
+        return [i for i in self.index.candidates(query)
+                if any(query.search(title) for title in ENTRIES[i])]
+
+    def test_same_as_scan(self):
+        for pattern in QUERIES:
+            for flags in (0, re.I):
+                query = re.compile(pattern, flags)
+                with self.subTest(query=query):
+                    self.assertEqual(self._scan(query), self._search(query))
+
+    def test_narrows_candidates(self):
+        candidates = self.index.candidates(re.compile('shingeki', re.I))
+        self.assertEqual([1], list(candidates))
+
+    def test_missing_trigram(self):
+        candidates = self.index.candidates(re.compile('nonexistent', re.I))
+        self.assertEqual([], list(candidates))
+
+    def test_special_case_folding(self):
+        query = re.compile('DIGIMON', re.I)
+        self.assertEqual([3], self._search(query))
+        query = re.compile('kelvin', re.I)
+        index = TrigramIndex([['Kelvin']])
+        self.assertEqual([0], list(index.candidates(query)))